@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Import-time benchmark of the centum package.
+
+Each statement is timed in fresh interpreters (the median of several runs is
+reported), together with the number of modules loaded and the peak RSS, so
+that regressions of the lazy submodule imports are easy to spot.
+
+Usage::
+
+    python benchmarks/import_time.py [--repeat 5]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+STATEMENTS = [
+    "import centum",
+    "import centum.utils",
+    "import centum.accounting",
+    "import centum.delineation",
+    "import centum.plotting",
+    "import centum.irrigation_district",
+    "import centum; centum.plotting.categorical_lut(['red'])",
+]
+
+PROBE = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+exec({statement!r})
+elapsed = time.perf_counter() - t0
+print(json.dumps({{
+    "seconds": elapsed,
+    "modules": len(sys.modules),
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy": sorted(m for m in ("matplotlib", "geopandas", "rasterio", "rioxarray", "geocube", "dask", "rich")
+                    if m in sys.modules),
+}}))
+"""
+
+
+def run(statement, repeat):
+    results = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", PROBE.format(statement=statement)],
+                             capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "seconds": statistics.median(r["seconds"] for r in results),
+        "modules": results[-1]["modules"],
+        "max_rss_mb": statistics.median(r["max_rss_mb"] for r in results),
+        "heavy": results[-1]["heavy"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per statement")
+    args = parser.parse_args()
+
+    print(f"{'statement':<58} {'time [s]':>9} {'modules':>8} {'RSS [MB]':>9}  heavy deps loaded")
+    for statement in STATEMENTS:
+        r = run(statement, args.repeat)
+        print(f"{statement:<58} {r['seconds']:>9.3f} {r['modules']:>8d} {r['max_rss_mb']:>9.1f}  "
+              f"{', '.join(r['heavy']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
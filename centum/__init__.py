@@ -1,4 +1,35 @@
-import centum.delineation
-import centum.irrigation_district
-import centum.plotting
-import centum.utils
+"""
+centum: irrigation delineation and water accounting from ET data.
+
+Submodules are imported lazily on first attribute access (PEP 562), so that
+`import centum` does not pull in the geospatial and plotting stacks, e.g.
+`centum.plotting` imports matplotlib only when it is first used.
+"""
+import importlib
+
+__all__ = [
+    "accounting",
+    "clc",
+    "cli",
+    "climatology",
+    "delineation",
+    "export",
+    "irrigation_district",
+    "ledger",
+    "plotting",
+    "regrid",
+    "utils",
+    "zonal",
+]
+
+
+def __getattr__(name):
+    if name in __all__:
+        module = importlib.import_module(f"{__name__}.{name}")
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
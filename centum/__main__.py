@@ -0,0 +1,5 @@
+import sys
+
+from centum.cli import main
+
+sys.exit(main())
@@ -1,9 +1,4 @@
-import centum.delineation
-import centum.irrigation_district
-import centum.plotting
-import centum.utils
 import xarray as xr
-import matplotlib.pyplot as plt
 
 import numpy as np
 import rioxarray  # you already have it
@@ -18,6 +13,8 @@ import xarray as xr
 import logging
 from typing import Tuple
 
+from centum.utils import same_grid
+
 @dataclass
 class Accounting:
     ds_baseline: xr.Dataset
@@ -25,27 +22,54 @@ class Accounting:
     variable: tuple[str, str] = ("ETa", "ETa")
     reference_period: tuple = None  # (start, end), as datetime-like strings or pd.Timestamp
     logger: logging.Logger = field(default=None, repr=False)
+    ensemble_dim: str = "ensemble"  # baseline dimension holding ensemble members, if any
+    quantiles: tuple = (0.05, 0.5, 0.95)  # quantiles reported for ensemble baselines
+    climatology_dir: str = None  # cache of reference-period climatologies, default in-memory only
+    climatology_groupby: str = "month"  # 'month' or 'dayofyear'
+    dataset_names: tuple = ("baseline", "EO")  # names keying the cached climatologies
+    dataset_ids: tuple = (None, None)  # optional versions of (baseline, EO) keying the cached climatologies
+    align_to: str = "baseline"  # grid used when baseline and EO grids differ: 'baseline' or 'EO'
+    regrid_cache_dir: str = None  # cache of the regridding indices between grid pairs
+    time_chunk: int = 31  # time steps regridded at once when grids differ
     freq='M'
     
+    @property
+    def is_ensemble(self) -> bool:
+        return self.ensemble_dim in self.ds_baseline.dims
+
     def __post_init__(self):
-        if not check_dimensions_consistent(self.ds_baseline, self.ds_EO):
+        # Ensemble members share the grid, times and NaN mask of the first one
+        ds_baseline_ref = self.ds_baseline
+        if self.is_ensemble:
+            ds_baseline_ref = self.ds_baseline.isel({self.ensemble_dim: 0}, drop=True)
+            if self.logger:
+                self.logger.info(f"📚 Baseline ensemble with {self.ds_baseline.sizes[self.ensemble_dim]} members")
+
+        # Mismatched grids are aligned lazily instead of being rejected
+        if not same_grid(ds_baseline_ref, self.ds_EO):
+            self.align_grids(ds_baseline_ref)
+            ds_baseline_ref = self.ds_baseline
+            if self.is_ensemble:
+                ds_baseline_ref = self.ds_baseline.isel({self.ensemble_dim: 0}, drop=True)
+
+        if not check_dimensions_consistent(ds_baseline_ref, self.ds_EO):
             raise ValueError("❌ Dimensions of the datasets are not consistent.")
         if self.logger:
             self.logger.info("✅ Datasets passed dimension consistency check")
     
-        if not check_time_consistent(self.ds_baseline, self.ds_EO):
+        if not check_time_consistent(ds_baseline_ref, self.ds_EO):
             raise ValueError("❌ Time coordinates of the datasets are not consistent.")
         if self.logger:
             self.logger.info("✅ Datasets passed time coordinate consistency check")
     
-        if not check_crs_consistent(self.ds_baseline, self.ds_EO):
+        if not check_crs_consistent(ds_baseline_ref, self.ds_EO):
             raise ValueError("❌ CRS of the datasets are not consistent.")
         if self.logger:
             self.logger.info("✅ Datasets passed CRS consistency check")
     
         # NaN mask at t0 consistency check
         try:
-            check_nan_mask_t0_consistent(self.ds_baseline, self.ds_EO, variable=self.variable)
+            check_nan_mask_t0_consistent(ds_baseline_ref, self.ds_EO, variable=self.variable)
             if self.logger:
                 self.logger.info("✅ NaN masks at t0 are consistent between datasets.")
         except ValueError as e:
@@ -80,13 +104,158 @@ class Accounting:
         ds_eo = self.ds_EO
         ds_baseline = self.ds_baseline
 
-        ds_net_irrigation = compute_net_irrigation(ds_baseline, ds_eo, variables=self.variable, freq=self.freq)
+        if self.is_ensemble:
+            ds_net_irrigation = compute_net_irrigation_ensemble(ds_baseline, ds_eo,
+                                                                variables=self.variable,
+                                                                freq=self.freq,
+                                                                quantiles=self.quantiles,
+                                                                ensemble_dim=self.ensemble_dim)
+        else:
+            ds_net_irrigation = compute_net_irrigation(ds_baseline, ds_eo, variables=self.variable, freq=self.freq)
+
+        if self.reference_period is not None:
+            if self.is_ensemble:
+                if self.logger:
+                    self.logger.warning("⚠️ Anomaly accounting is not available for ensemble baselines")
+            else:
+                ds_anomaly = self.compute_anomaly_accounting()
+                ds_net_irrigation = ds_net_irrigation.merge(ds_anomaly)
         
         if self.logger:
             self.logger.info("✅ Accounting analysis complete")
             
         return ds_net_irrigation
 
+    def align_grids(self, ds_baseline_ref=None):
+        """
+        Put the baseline and EO datasets on a common grid.
+
+        The dataset not on the `align_to` grid is regridded lazily with a
+        nearest-neighbour index mapping (see centum.regrid.Regridder), computed
+        once per grid pair and cached in `regrid_cache_dir`. The gather is then
+        applied per time chunk when the accounting is computed. NaN masks of
+        both datasets are harmonised, since grid edges rarely match.
+        """
+        from centum.regrid import Regridder
+
+        if ds_baseline_ref is None:
+            ds_baseline_ref = self.ds_baseline
+        if self.align_to not in ("baseline", "EO"):
+            raise ValueError("align_to must be 'baseline' or 'EO'.")
+
+        if self.align_to == "baseline":
+            regridder = Regridder.from_grids(self.ds_EO, ds_baseline_ref, cache_dir=self.regrid_cache_dir)
+            ds_EO = self.ds_EO[[self.variable[1]]].chunk({"time": self.time_chunk, "y": -1, "x": -1})
+            self.ds_EO = regridder.apply(ds_EO).assign_coords(time=self.ds_EO["time"])
+        else:
+            regridder = Regridder.from_grids(ds_baseline_ref, self.ds_EO, cache_dir=self.regrid_cache_dir)
+            ds_baseline = self.ds_baseline[[self.variable[0]]].chunk({"time": self.time_chunk, "y": -1, "x": -1})
+            self.ds_baseline = regridder.apply(ds_baseline).assign_coords(time=self.ds_baseline["time"])
+        if self.logger:
+            self.logger.info(f"🔀 Grids aligned on the {self.align_to} grid {regridder.target_shape}")
+
+        da_baseline = self.ds_baseline[self.variable[0]]
+        da_EO = self.ds_EO[self.variable[1]]
+        if self.is_ensemble:
+            da_baseline = da_baseline.isel({self.ensemble_dim: 0}, drop=True)
+        valid = (da_baseline.isel(time=0).notnull() & da_EO.isel(time=0).notnull()).compute()
+        self.ds_baseline = self.ds_baseline.where(valid)
+        self.ds_EO = self.ds_EO.where(valid)
+
+    def get_climatologies(self):
+        """
+        Climatologies of baseline and EO ETa over the reference period.
+
+        When `climatology_dir` is set, climatologies are cached there, keyed by
+        `dataset_names`, `dataset_ids`, variable, period and grid, and reused
+        by later runs, so the reference years need not be part of the datasets
+        once cached. If they are, a changed dataset is detected and its
+        climatology recomputed.
+
+        Returns:
+        - tuple of xarray.Dataset (baseline, EO), see centum.climatology.compute_climatology
+        """
+        from centum.climatology import ClimatologyCache, compute_climatology
+
+        if self.reference_period is None:
+            raise ValueError("reference_period must be set to compute climatologies.")
+
+        climatologies = []
+        for name, dataset_id, ds, var in zip(self.dataset_names, self.dataset_ids,
+                                             (self.ds_baseline, self.ds_EO), self.variable):
+            if self.climatology_dir is not None:
+                cache = ClimatologyCache(self.climatology_dir)
+                ds_clim = cache.get_or_compute(name, ds[var], self.reference_period,
+                                               groupby=self.climatology_groupby, dataset_id=dataset_id)
+            else:
+                ds_clim = compute_climatology(ds[var], self.reference_period,
+                                              groupby=self.climatology_groupby)
+            climatologies.append(ds_clim)
+        if self.logger:
+            self.logger.info(f"✅ Climatologies ready for reference period {self.reference_period}")
+        return tuple(climatologies)
+
+    def compute_anomaly_accounting(self):
+        """
+        Net irrigation computed on ETa anomalies against the reference climatology.
+
+        Returns:
+        - xarray.Dataset with 'volume_anomaly' and 'volume_mm_anomaly'
+        """
+        from centum.climatology import compute_anomaly
+
+        clim_baseline, clim_eo = self.get_climatologies()
+        ds_baseline = compute_anomaly(self.ds_baseline[self.variable[0]], clim_baseline).to_dataset()
+        ds_eo = compute_anomaly(self.ds_EO[self.variable[1]], clim_eo).to_dataset()
+
+        ds_anomaly = compute_net_irrigation(ds_baseline, ds_eo, variables=self.variable, freq=self.freq)
+        return ds_anomaly.rename({var: f"{var}_anomaly" for var in ds_anomaly.data_vars})
+
+    def run_zonal(self, zones):
+        """
+        Run the accounting and aggregate the volumes per zone.
+
+        Parameters:
+        - zones: zone raster (y, x) on the accounting grid, or a fractional
+          coverage (centum.zonal.ZoneCoverage, see IrrigationDistrict.convert_to_coverage)
+
+        Returns:
+        - xarray.Dataset of per-zone totals with dims (time, zone)
+        """
+        from centum.zonal import zonal_sum
+
+        ds_net_irrigation = self.run()
+        return xr.Dataset({var: zonal_sum(ds_net_irrigation[var], zones)
+                           for var in ds_net_irrigation.data_vars
+                           if {'y', 'x'} <= set(ds_net_irrigation[var].dims)},
+                          attrs=ds_net_irrigation.attrs)
+
+    def update_ledger(self, store_path, zones=None, close_until=None):
+        """
+        Ingest the datasets into an on-disk accounting ledger.
+
+        Only the periods covered by the datasets are recomputed; periods
+        already closed in the ledger are served from the store.
+
+        Parameters:
+        - store_path: directory of the ledger (created if missing)
+        - zones: optional zone raster (y, x) for per-zone totals
+        - close_until: optional period label; open periods up to it are closed
+
+        Returns:
+        - centum.ledger.AccountingLedger
+        """
+        from centum.ledger import AccountingLedger
+
+        ledger = AccountingLedger(store_path, freq=self.freq, variable=self.variable,
+                                  zones=zones, logger=self.logger)
+        updated = ledger.ingest(self.ds_baseline, self.ds_EO)
+        if self.logger:
+            self.logger.info(f"✅ Ledger updated for period(s): {updated}")
+        if close_until is not None:
+            ledger.close(until=close_until)
+        return ledger
+
 
 
 def compute_water_accounting(ds, variable='ETa', freq='M'):
@@ -152,6 +321,62 @@ def compute_net_irrigation(ds_baseline, ds_eo, variables=('ETa', 'ETa'), freq='M
     ds_net_irrigation.attrs['description'] = "Net irrigation volume and depth (baseline - EO)"
     return ds_net_irrigation
 
+
+def compute_net_irrigation_ensemble(ds_baseline, ds_eo, variables=('ETa', 'ETa'), freq='M',
+                                    quantiles=(0.05, 0.5, 0.95), ensemble_dim='ensemble',
+                                    chunks=None):
+    """
+    Compute net irrigation statistics for an ensemble of baseline runs.
+
+    All members are processed in one vectorized pass: the baseline is chunked
+    along the ensemble and spatial dimensions so that the daily volume cube of
+    every member is never held in memory at once; only the period totals
+    (ensemble, time, y, x) are reduced to statistics, one spatial tile at a time.
+
+    Parameters:
+    - ds_baseline: xarray.Dataset with baseline ETa in mm/day and an ensemble dimension
+    - ds_eo: xarray.Dataset with EO ETa in mm/day
+    - variables: names of the ETa variables in (baseline, EO)
+    - freq: time resampling frequency ('M' = month, '6M' = semester)
+    - quantiles: quantiles of the net irrigation across members
+    - ensemble_dim: name of the ensemble dimension of ds_baseline
+    - chunks: dask chunks of ds_baseline (and spatial chunks of ds_eo),
+      default {ensemble_dim: 10, 'time': -1, 'y': 256, 'x': 256}
+
+    Returns:
+    - xarray.Dataset with, for 'volume' and 'volume_mm', the ensemble '<var>_mean',
+      '<var>_std' and '<var>_quantile' (with a 'quantile' dimension)
+    """
+    if ensemble_dim not in ds_baseline.dims:
+        raise ValueError(f"Baseline dataset has no '{ensemble_dim}' dimension.")
+
+    if chunks is None:
+        chunks = {ensemble_dim: 10, 'time': -1, 'y': 256, 'x': 256}
+    ds_baseline = ds_baseline[[variables[0]]].chunk({d: c for d, c in chunks.items() if d in ds_baseline.dims})
+    spatial_chunks = {d: c for d, c in chunks.items() if d in ('y', 'x') and d in ds_eo.dims}
+    ds_eo = ds_eo[[variables[1]]].chunk(spatial_chunks)
+
+    ds_volume_baseline = compute_water_accounting(ds_baseline, variable=variables[0], freq=freq)
+    ds_volume_eo = compute_water_accounting(ds_eo, variable=variables[1], freq=freq)
+
+    # net = EO - baseline is linear in the baseline: reduce the period totals only
+    ds_net = (ds_volume_eo - ds_volume_baseline).chunk({ensemble_dim: -1})
+
+    ds_out = xr.Dataset()
+    for var in ds_net.data_vars:
+        ds_out[f'{var}_mean'] = ds_net[var].mean(dim=ensemble_dim)
+        ds_out[f'{var}_std'] = ds_net[var].std(dim=ensemble_dim)
+        ds_out[f'{var}_quantile'] = ds_net[var].quantile(list(quantiles), dim=ensemble_dim)
+        for suffix in ('mean', 'std', 'quantile'):
+            ds_out[f'{var}_{suffix}'].attrs.update(ds_volume_eo[var].attrs)
+
+    ds_out = ds_out.compute()
+    ds_out.attrs['description'] = (
+        f"Net irrigation volume and depth (baseline - EO) over "
+        f"{ds_baseline.sizes[ensemble_dim]} baseline ensemble members"
+    )
+    return ds_out
+
      
 def compute_pixel_area(da):
     """
@@ -358,7 +583,7 @@ def check_nan_mask_t0_consistent(ds1: xr.Dataset, ds2: xr.Dataset, variable: Tup
 def check_nb_of_nan_over_time(ds: xr.Dataset, variable: str = 'ETa'):
     da = ds[variable]
     spatial_dims = [dim for dim in da.dims if dim != 'time']
-    nan_counts = da.isnull().sum(dim=spatial_dims)
+    nan_counts = da.isnull().sum(dim=spatial_dims).compute()
 
     if not (nan_counts == nan_counts[0]).all():
         raise ValueError(f"Inconsistent NaN counts over time: {nan_counts.values}")
@@ -370,6 +595,8 @@ def plot_monthly_et(monthly_ds, var='ETa_monthly_sum'):
     """
     Plot spatially averaged monthly ETa.
     """
+    import matplotlib.pyplot as plt
+
     # Average spatially (x, y dims) to get time series
     monthly_mean = monthly_ds[var].mean(dim=['x', 'y'], skipna=True)
     
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Integer lookup tables for CORINE Land Cover (CLC) rasters.
+
+CLC codes (e.g. 212, Permanently irrigated land) are mapped once to a dense
+class index, from which level 1/2/3 groups and the irrigable flag are read
+with a single `np.take`. Whole rasters are thus classified, grouped and
+masked in one vectorized pass instead of one comparison per class.
+"""
+import numpy as np
+import xarray as xr
+
+from centum.utils import get_CLC_code_def
+
+
+LEVEL1_NAMES = {
+    1: "Artificial surfaces",
+    2: "Agricultural areas",
+    3: "Forest and semi natural areas",
+    4: "Wetlands",
+    5: "Water bodies",
+}
+
+LEVEL2_NAMES = {
+    11: "Urban fabric",
+    12: "Industrial, commercial and transport units",
+    13: "Mine, dump and construction sites",
+    14: "Artificial, non-agricultural vegetated areas",
+    21: "Arable land",
+    22: "Permanent crops",
+    23: "Pastures",
+    24: "Heterogeneous agricultural areas",
+    31: "Forests",
+    32: "Scrub and/or herbaceous vegetation associations",
+    33: "Open spaces with little or no vegetation",
+    41: "Inland wetlands",
+    42: "Maritime wetlands",
+    51: "Inland waters",
+    52: "Marine waters",
+}
+
+LEVEL3_NAMES = {int(code): name for code, name in get_CLC_code_def().items()}
+
+#: Classes considered irrigable: permanently irrigated land (212), rice fields (213)
+#: and the permanent crops (221 vineyards, 222 fruit trees, 223 olive groves).
+#: Non-irrigated arable land (211), pastures (231) and the heterogeneous classes
+#: (241-244) are excluded; pass `irrigable_codes` to change the selection.
+IRRIGABLE_CODES = (212, 213, 221, 222, 223)
+
+#: All agricultural classes (level 1 group 2)
+AGRICULTURAL_CODES = tuple(code for code in LEVEL3_NAMES if code // 100 == 2)
+
+#: Sorted CLC level 3 codes; position in this array is the class index
+CODES = np.array(sorted(LEVEL3_NAMES), dtype="int16")
+#: Class index of pixels without a valid CLC code
+NODATA_INDEX = len(CODES)
+
+_MAX_CODE = 1000
+
+
+def _code_to_index_table() -> np.ndarray:
+    table = np.full(_MAX_CODE, NODATA_INDEX, dtype="int16")
+    table[CODES] = np.arange(len(CODES), dtype="int16")
+    return table
+
+
+#: LUT code -> class index, NODATA_INDEX for unknown codes
+CODE_TO_INDEX = _code_to_index_table()
+
+#: LUTs class index -> group code (0 for nodata)
+INDEX_TO_LEVEL = {
+    1: np.append(CODES // 100, 0).astype("int16"),
+    2: np.append(CODES // 10, 0).astype("int16"),
+    3: np.append(CODES, 0).astype("int16"),
+}
+
+LEVEL_NAMES = {1: LEVEL1_NAMES, 2: LEVEL2_NAMES, 3: LEVEL3_NAMES}
+
+
+def irrigable_table(codes=IRRIGABLE_CODES) -> np.ndarray:
+    """
+    LUT class index -> irrigable flag.
+
+    Parameters
+    ----------
+    codes : iterable of int, optional
+        CLC codes considered irrigable. Default is IRRIGABLE_CODES.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean array of length NODATA_INDEX + 1 (nodata is not irrigable).
+    """
+    table = np.zeros(NODATA_INDEX + 1, dtype=bool)
+    table[CODE_TO_INDEX[np.asarray(codes, dtype="int64")]] = True
+    table[NODATA_INDEX] = False
+    return table
+
+
+def _apply(func, codes, dtype):
+    if isinstance(codes, xr.DataArray):
+        return xr.apply_ufunc(func, codes, dask="parallelized", output_dtypes=[dtype])
+    return func(np.asarray(codes))
+
+
+def _index(codes: np.ndarray) -> np.ndarray:
+    if np.issubdtype(codes.dtype, np.integer):
+        valid = (codes >= 0) & (codes < _MAX_CODE)
+        return np.take(CODE_TO_INDEX, np.where(valid, codes, 0))
+    valid = np.isfinite(codes) & (codes >= 0) & (codes < _MAX_CODE)
+    return np.take(CODE_TO_INDEX, np.where(valid, codes, 0).astype("int64"))
+
+
+def code_to_index(codes):
+    """
+    Map CLC codes to class indices (positions in CODES).
+
+    Parameters
+    ----------
+    codes : np.ndarray or xr.DataArray
+        CLC level 3 codes, integer or float (NaN = nodata).
+
+    Returns
+    -------
+    np.ndarray or xr.DataArray
+        int16 class indices, NODATA_INDEX for nodata and unknown codes.
+    """
+    return _apply(_index, codes, "int16")
+
+
+def classify(codes, level: int = 1):
+    """
+    Map CLC codes to their level 1, 2 or 3 group code.
+
+    Parameters
+    ----------
+    codes : np.ndarray or xr.DataArray
+        CLC level 3 codes.
+    level : int, optional
+        1 (e.g. 2 = Agricultural areas), 2 (e.g. 21 = Arable land) or 3. Default is 1.
+
+    Returns
+    -------
+    np.ndarray or xr.DataArray
+        int16 group codes, 0 for nodata.
+    """
+    if level not in INDEX_TO_LEVEL:
+        raise ValueError(f"level must be one of {list(INDEX_TO_LEVEL)}.")
+    table = INDEX_TO_LEVEL[level]
+    return _apply(lambda c: np.take(table, _index(c)), codes, "int16")
+
+
+def irrigable_mask(codes, irrigable_codes=IRRIGABLE_CODES):
+    """
+    Boolean mask of the pixels whose CLC class is irrigable.
+
+    Parameters
+    ----------
+    codes : np.ndarray or xr.DataArray
+        CLC level 3 codes.
+    irrigable_codes : iterable of int, optional
+        CLC codes considered irrigable. Default is IRRIGABLE_CODES.
+
+    Returns
+    -------
+    np.ndarray or xr.DataArray
+        Boolean mask.
+    """
+    table = irrigable_table(irrigable_codes)
+    return _apply(lambda c: np.take(table, _index(c)), codes, bool)
+
+
+def group_masks(codes, level: int = 1, groups=None):
+    """
+    Boolean masks of several land-cover groups from a single pass.
+
+    The codes are mapped to groups with one `take`, and all the masks are
+    obtained with one broadcast comparison.
+
+    Parameters
+    ----------
+    codes : np.ndarray or xr.DataArray
+        CLC level 3 codes, shape (..., y, x).
+    level : int, optional
+        Grouping level (1, 2 or 3). Default is 1.
+    groups : list of int, optional
+        Group codes to return, e.g. [212, 244] at level 3. Default is every
+        group of the level.
+
+    Returns
+    -------
+    np.ndarray or xr.DataArray
+        Boolean masks of shape (group, ...). For a DataArray, the new
+        'clc_group' dim carries the group codes and a 'clc_name' coordinate.
+    """
+    if groups is None:
+        groups = sorted(LEVEL_NAMES[level])
+    groups = np.asarray(groups, dtype="int16")
+    grouped = classify(codes, level=level)
+
+    if isinstance(grouped, xr.DataArray):
+        group_da = xr.DataArray(groups, dims="clc_group", coords={"clc_group": groups})
+        masks = (grouped == group_da).transpose("clc_group", *grouped.dims)
+        names = [LEVEL_NAMES[level].get(int(g), str(g)) for g in groups]
+        return masks.assign_coords(clc_name=("clc_group", names))
+
+    return grouped[None, ...] == groups.reshape((-1,) + (1,) * grouped.ndim)
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Command-line interface of centum.
+
+Subcommands
+-----------
+centum delineate
+    Irrigation delineation (ETAnalysis) of ETa/ETp cubes; writes the decision
+    cube and the event types to a Zarr or NetCDF store, with compact encodings
+    and a chunk layout tuned for map or time-series reads.
+centum account
+    Water accounting (Accounting) of a baseline against an EO dataset; writes
+    the net irrigation volumes, optionally updating an accounting ledger.
+centum validate
+    Consistency checks of the inputs of both commands, without computing.
+
+Inputs are NetCDF files or Zarr stores opened lazily with the requested dask
+chunks; outputs are streamed to the store chunk by chunk, with progress and
+per-step timing.
+
+Example::
+
+    centum delineate --eta ETa.nc --etp ETp.nc --chunks time=-1,y=256,x=256 \\
+        --workers 8 --output decision.zarr
+"""
+import argparse
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+
+# ----------------------------------------------------------------------
+# helpers
+# ----------------------------------------------------------------------
+@contextmanager
+def timed(step: str, quiet: bool = False):
+    """Print the wall time of a step."""
+    if not quiet:
+        print(f"▶️ {step}...", flush=True)
+    t0 = time.perf_counter()
+    yield
+    if not quiet:
+        print(f"⏱️ {step}: {time.perf_counter() - t0:.2f} s", flush=True)
+
+
+def parse_chunks(text: str) -> dict:
+    """
+    Parse a chunk specification such as 'time=-1,y=256,x=256'.
+
+    Returns
+    -------
+    dict
+        Mapping dim -> chunk size (-1 for a single chunk, 'auto' allowed).
+    """
+    chunks = {}
+    if not text:
+        return chunks
+    for item in text.split(","):
+        dim, _, size = item.partition("=")
+        if not size:
+            raise argparse.ArgumentTypeError(f"Invalid chunk specification '{item}', expected dim=size.")
+        chunks[dim.strip()] = size.strip() if size.strip() == "auto" else int(size)
+    return chunks
+
+
+def open_dataset(path: str, chunks: dict = None):
+    """Open a NetCDF file or a Zarr store lazily with dask chunks."""
+    import rioxarray  # noqa: F401  (registers the .rio accessor)
+    import xarray as xr
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Input not found: {path}")
+    chunks = chunks or {}
+    if path.rstrip("/").endswith(".zarr") or os.path.isdir(path):
+        ds = xr.open_zarr(path, chunks=None, decode_coords="all")
+    else:
+        ds = xr.open_dataset(path, chunks={}, decode_coords="all")
+    chunks = {d: c for d, c in chunks.items() if d in ds.dims}
+    return ds.chunk(chunks) if chunks else ds
+
+
+def write_dataset(ds, path: str, chunks: dict = None, progress: bool = True):
+    """
+    Stream a (dask-backed) dataset to a Zarr store or NetCDF file.
+
+    The dataset is rechunked to `chunks` (uniform chunks, as required by Zarr)
+    and computed chunk by chunk while being written.
+    """
+    from dask.diagnostics import ProgressBar
+
+    chunks = {d: c for d, c in (chunks or {}).items() if d in ds.dims}
+    ds = ds.chunk(chunks) if chunks else ds.unify_chunks()
+    for var in ds.variables.values():
+        var.encoding.pop("chunks", None)
+        var.encoding.pop("preferred_chunks", None)
+
+    if path.endswith(".nc"):
+        delayed = ds.to_netcdf(path, compute=False)
+    else:
+        delayed = ds.to_zarr(path, mode="w", compute=False, consolidated=True)
+
+    if progress:
+        with ProgressBar():
+            delayed.compute()
+    else:
+        delayed.compute()
+
+
+def configure_dask(workers: int = None, scheduler: str = "threads"):
+    """Set the dask scheduler and number of workers used by the run."""
+    import dask
+
+    config = {"scheduler": scheduler}
+    if workers:
+        config["num_workers"] = workers
+    dask.config.set(config)
+
+
+def _message(error) -> str:
+    # KeyError quotes its message when converted with str(); some centum errors
+    # already carry the ❌ marker
+    message = str(error.args[0]) if error.args else str(error)
+    return message.removeprefix("❌").strip()
+
+
+def _variables(ds, names, label):
+    missing = [n for n in names if n not in ds.data_vars]
+    if missing:
+        raise KeyError(f"Variable(s) {missing} not found in the {label} dataset "
+                       f"(available: {list(ds.data_vars)}).")
+
+
+def _load_delineation_inputs(args):
+    ds = open_dataset(args.eta, args.chunks)
+    _variables(ds, [args.eta_var], "ETa")
+    ds = ds[[args.eta_var]].rename({args.eta_var: "ETa"})
+    if args.etp is not None and args.etp != args.eta:
+        ds_etp = open_dataset(args.etp, args.chunks)
+    else:
+        ds_etp = open_dataset(args.eta, args.chunks)
+    _variables(ds_etp, [args.etp_var], "ETp")
+    ds["ETp"] = ds_etp[args.etp_var]
+    return ds.sortby("time")
+
+
+def _load_accounting_inputs(args):
+    ds_baseline = open_dataset(args.baseline, args.chunks)
+    ds_EO = open_dataset(args.eo, args.chunks)
+    _variables(ds_baseline, [args.variable[0]], "baseline")
+    _variables(ds_EO, [args.variable[1]], "EO")
+    return ds_baseline, ds_EO
+
+
+# ----------------------------------------------------------------------
+# subcommands
+# ----------------------------------------------------------------------
+def run_delineate(args) -> int:
+    from centum.delineation import ETAnalysis
+    from centum.export import write_decision_cube
+
+    with timed("Opening inputs", args.quiet):
+        ds = _load_delineation_inputs(args)
+        if not args.quiet:
+            print(f"📦 {dict(ds.sizes)}, chunks {dict(ds.chunks)}")
+
+    analysis = ETAnalysis(threshold_local=args.threshold_local,
+                          threshold_regional=args.threshold_regional,
+                          log_file=args.log_file)
+    kwargs = {}
+    if args.window_size_x is not None:
+        kwargs["window_size_x"] = args.window_size_x
+
+    with timed("Building delineation graph", args.quiet):
+        decision_ds, event_type = analysis.irrigation_delineation(ds, time_window=args.time_window, **kwargs)
+        if args.events_only:
+            decision_ds = decision_ds[[]]
+
+    with timed(f"Writing {args.output}", args.quiet):
+        write_decision_cube(decision_ds, args.output, event_type=event_type, crs=ds.rio.crs,
+                            layout=args.layout, chunks=args.chunks, progress=not args.quiet)
+    return 0
+
+
+def run_account(args) -> int:
+    from centum.accounting import Accounting
+
+    with timed("Opening inputs", args.quiet):
+        ds_baseline, ds_EO = _load_accounting_inputs(args)
+
+    with timed("Checking inputs", args.quiet):
+        accounting = Accounting(ds_baseline, ds_EO, variable=tuple(args.variable),
+                                regrid_cache_dir=args.cache_dir)
+        accounting.freq = args.freq
+
+    with timed("Building accounting graph", args.quiet):
+        ds_out = accounting.run()
+
+    with timed(f"Writing {args.output}", args.quiet):
+        write_dataset(ds_out, args.output, args.chunks, progress=not args.quiet)
+
+    if args.ledger is not None:
+        zones = None
+        if args.zones is not None:
+            zones = open_dataset(args.zones)[args.zone_var].load()
+        with timed(f"Updating ledger {args.ledger}", args.quiet):
+            accounting.update_ledger(args.ledger, zones=zones, close_until=args.close_until)
+    return 0
+
+
+def run_validate(args) -> int:
+    if args.eta is None and args.baseline is None:
+        print("❌ Nothing to validate: give --eta (delineation) and/or --baseline/--eo (accounting).")
+        return 2
+
+    failures = 0
+    if args.eta is not None:
+        from centum.delineation import ETAnalysis
+
+        with timed("Validating delineation inputs", args.quiet):
+            try:
+                ds = _load_delineation_inputs(args)
+                ETAnalysis(log_file=args.log_file).check_data_validity(ds)
+            except (ValueError, KeyError, FileNotFoundError) as e:
+                print(f"❌ {_message(e)}")
+                failures += 1
+
+    if args.baseline is not None:
+        from centum.accounting import Accounting
+
+        with timed("Validating accounting inputs", args.quiet):
+            try:
+                if args.eo is None:
+                    raise ValueError("--eo is required with --baseline.")
+                ds_baseline, ds_EO = _load_accounting_inputs(args)
+                Accounting(ds_baseline, ds_EO, variable=tuple(args.variable))
+                print("✅ Accounting inputs are consistent.")
+            except (ValueError, KeyError, FileNotFoundError) as e:
+                print(f"❌ {_message(e)}")
+                failures += 1
+
+    return 1 if failures else 0
+
+
+# ----------------------------------------------------------------------
+# parser
+# ----------------------------------------------------------------------
+def _add_common(parser):
+    parser.add_argument("--chunks", type=parse_chunks, default={},
+                        help="dask chunks of inputs and outputs, e.g. 'time=-1,y=256,x=256'")
+    parser.add_argument("--workers", type=int, default=None, help="number of dask workers")
+    parser.add_argument("--scheduler", choices=["threads", "processes", "synchronous"], default="threads",
+                        help="dask scheduler (default: threads)")
+    parser.add_argument("--quiet", action="store_true", help="no progress or timing output")
+
+
+def _add_delineation_inputs(parser, required=True):
+    parser.add_argument("--eta", required=required, help="NetCDF/Zarr input holding ETa")
+    parser.add_argument("--etp", help="NetCDF/Zarr input holding ETp (default: the ETa input)")
+    parser.add_argument("--eta-var", default="ETa", help="ETa variable name (default: ETa)")
+    parser.add_argument("--etp-var", default="ETp", help="ETp variable name (default: ETp)")
+    parser.add_argument("--log-file", default="ET_analysis_log.md", help="ETAnalysis log file")
+
+
+def _add_accounting_inputs(parser, required=True):
+    parser.add_argument("--baseline", required=required, help="NetCDF/Zarr baseline ET input")
+    parser.add_argument("--eo", required=required, help="NetCDF/Zarr EO ET input")
+    parser.add_argument("--variable", nargs=2, default=["ETa", "ETa"], metavar=("BASELINE", "EO"),
+                        help="ET variable names in the baseline and EO inputs (default: ETa ETa)")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="centum",
+        description="Irrigation delineation and water accounting from ET cubes.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("delineate", help="delineate irrigation and rain events")
+    _add_delineation_inputs(p)
+    p.add_argument("--threshold-local", type=float, default=0.25, help="local ratio threshold (default: 0.25)")
+    p.add_argument("--threshold-regional", type=float, default=0.25,
+                   help="regional ratio threshold (default: 0.25)")
+    p.add_argument("--time-window", type=int, default=10, help="rolling time window in steps (default: 10)")
+    p.add_argument("--window-size-x", type=float, default=None, help="regional window size (CRS units)")
+    p.add_argument("--events-only", action="store_true", help="only write event_type")
+    p.add_argument("--layout", choices=["map", "timeseries", "balanced"], default="balanced",
+                   help="output chunk layout: daily maps, pixel time series or both (default: balanced)")
+    p.add_argument("--output", "-o", required=True, help="output .zarr store or .nc file")
+    _add_common(p)
+    p.set_defaults(func=run_delineate)
+
+    p = subparsers.add_parser("account", help="compute net irrigation water accounting")
+    _add_accounting_inputs(p)
+    p.add_argument("--freq", default="M", help="accounting period (pandas alias, default: M)")
+    p.add_argument("--cache-dir", default=None, help="cache of regridding indices")
+    p.add_argument("--output", "-o", required=True, help="output .zarr store or .nc file")
+    p.add_argument("--ledger", default=None, help="accounting ledger store to update")
+    p.add_argument("--zones", default=None, help="NetCDF/Zarr zone raster for ledger zone totals")
+    p.add_argument("--zone-var", default="zone", help="zone variable name (default: zone)")
+    p.add_argument("--close-until", default=None, help="close ledger periods up to this period")
+    _add_common(p)
+    p.set_defaults(func=run_account)
+
+    p = subparsers.add_parser("validate", help="check delineation and/or accounting inputs")
+    _add_delineation_inputs(p, required=False)
+    _add_accounting_inputs(p, required=False)
+    _add_common(p)
+    p.set_defaults(func=run_validate)
+    return parser
+
+
+def main(argv=None) -> int:
+    """Entry point of the `centum` console script."""
+    args = build_parser().parse_args(argv)
+    configure_dask(args.workers, args.scheduler)
+    t0 = time.perf_counter()
+    try:
+        status = args.func(args)
+    except (FileNotFoundError, KeyError, ValueError) as e:
+        print(f"❌ {_message(e)}", file=sys.stderr)
+        status = 2
+    if not args.quiet:
+        print(f"🏁 centum {args.command} finished in {time.perf_counter() - t0:.2f} s (exit {status})")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
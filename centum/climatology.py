@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reference-period climatology of ETa and anomalies against it.
+
+The climatology (per-pixel mean, standard deviation and count for each month
+or day of year) is computed once over a reference period in a streaming pass
+over time blocks, and cached on disk keyed by dataset, variable, period,
+grouping and grid, with a fingerprint of the reference-period data checked
+whenever the reference years are present again. Later analyses load it instead of rereading the reference
+years.
+"""
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from centum.utils import grid_signature
+
+
+GROUPINGS = {"month": 12, "dayofyear": 366}
+
+
+def _time_groups(time_values, groupby: str) -> np.ndarray:
+    index = pd.DatetimeIndex(time_values)
+    if groupby == "month":
+        return index.month.values
+    if groupby == "dayofyear":
+        return index.dayofyear.values
+    raise ValueError(f"groupby must be one of {list(GROUPINGS)}.")
+
+
+def compute_climatology(da: xr.DataArray, reference_period: tuple,
+                        groupby: str = "month", block_size: int = 31) -> xr.Dataset:
+    """
+    Compute per-pixel climatological statistics over a reference period.
+
+    The DataArray is read block by block along time (lazy or on-disk arrays
+    are only loaded one block at a time), accumulating sum, sum of squares
+    and count for each group.
+
+    Parameters
+    ----------
+    da : xr.DataArray
+        Daily ETa with dims (time, y, x).
+    reference_period : tuple
+        (start, end) of the reference period, datetime-like.
+    groupby : str, optional
+        'month' or 'dayofyear'. Default is 'month'.
+    block_size : int, optional
+        Number of time steps loaded at once. Default is 31.
+
+    Returns
+    -------
+    xr.Dataset
+        'mean', 'std' and 'count' with dims (groupby, y, x).
+    """
+    start, end = reference_period
+    da = da.sel(time=slice(start, end)).transpose("time", "y", "x")
+    if da.sizes["time"] == 0:
+        raise ValueError(f"No time steps within the reference period {reference_period}.")
+
+    if groupby not in GROUPINGS:
+        raise ValueError(f"groupby must be one of {list(GROUPINGS)}.")
+    n_groups = GROUPINGS[groupby]
+    shape = (n_groups, da.sizes["y"], da.sizes["x"])
+    acc_sum = np.zeros(shape)
+    acc_sq = np.zeros(shape)
+    acc_count = np.zeros(shape, dtype="int64")
+
+    groups = _time_groups(da["time"].values, groupby) - 1
+    for i0 in range(0, da.sizes["time"], block_size):
+        block = np.asarray(da.isel(time=slice(i0, i0 + block_size)).values, dtype="float64")
+        block_groups = groups[i0:i0 + block_size]
+        valid = np.isfinite(block)
+        values = np.where(valid, block, 0.0)
+        np.add.at(acc_sum, block_groups, values)
+        np.add.at(acc_sq, block_groups, values ** 2)
+        np.add.at(acc_count, block_groups, valid)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = acc_sum / acc_count
+        var = np.maximum(acc_sq / acc_count - mean ** 2, 0.0)
+
+    coords = {groupby: np.arange(1, n_groups + 1), "y": da["y"].values, "x": da["x"].values}
+    ds_clim = xr.Dataset(
+        {
+            "mean": ((groupby, "y", "x"), mean),
+            "std": ((groupby, "y", "x"), np.sqrt(var)),
+            "count": ((groupby, "y", "x"), acc_count),
+        },
+        coords=coords,
+    )
+    ds_clim.attrs.update({
+        "variable": str(da.name),
+        "reference_start": str(pd.Timestamp(start).date()),
+        "reference_end": str(pd.Timestamp(end).date()),
+        "groupby": groupby,
+    })
+    return ds_clim
+
+
+def compute_anomaly(da: xr.DataArray, ds_clim: xr.Dataset) -> xr.DataArray:
+    """
+    Subtract the climatological mean of the matching month/day of year.
+
+    Parameters
+    ----------
+    da : xr.DataArray
+        Daily ETa with dims (time, y, x), on the grid of the climatology.
+    ds_clim : xr.Dataset
+        Climatology returned by `compute_climatology`.
+
+    Returns
+    -------
+    xr.DataArray
+        Anomaly with the dims and coordinates of `da`.
+    """
+    groupby = ds_clim.attrs["groupby"]
+    groups = xr.DataArray(_time_groups(da["time"].values, groupby), dims="time",
+                          coords={"time": da["time"]})
+    clim_mean = ds_clim["mean"].sel({groupby: groups}).drop_vars(groupby)
+    anomaly = (da - clim_mean.assign_coords(y=da["y"], x=da["x"])).rename(da.name)
+    anomaly.attrs.update(da.attrs)
+    anomaly.attrs["anomaly_reference"] = f"{ds_clim.attrs['reference_start']}/{ds_clim.attrs['reference_end']}"
+    return anomaly
+
+
+def content_fingerprint(da: xr.DataArray, reference_period: tuple) -> str:
+    """
+    Fingerprint of the data of a reference period.
+
+    Dask-backed data are identified by their dask token (derived from the
+    source files and the operations applied to them, without computing);
+    in-memory data are hashed.
+
+    Parameters
+    ----------
+    da : xr.DataArray
+        Daily data with a time dimension.
+    reference_period : tuple
+        (start, end) of the reference period.
+
+    Returns
+    -------
+    str
+        Hexadecimal digest.
+    """
+    start, end = (pd.Timestamp(t) for t in reference_period)
+    da_ref = da.sel(time=slice(start, end))
+    if da_ref.chunks is not None:
+        from dask.base import tokenize
+
+        return tokenize(da_ref.data)
+    h = hashlib.sha1(str((da_ref.shape, da_ref.dtype)).encode())
+    h.update(np.ascontiguousarray(da_ref.values).data)
+    return h.hexdigest()
+
+
+@dataclass
+class ClimatologyCache:
+    """
+    On-disk cache of climatologies.
+
+    Attributes
+    ----------
+    cache_dir : str
+        Directory holding the cached climatologies (one NetCDF file each).
+    """
+    cache_dir: str
+
+    def __post_init__(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, name: str, da, reference_period: tuple, groupby: str = "month",
+            dataset_id: str = None) -> str:
+        """
+        Cache key of a dataset climatology.
+
+        The key depends on the dataset name and optional id (e.g. a model run
+        or product version), the variable, period, grouping and grid, but not
+        on the data, so that later analyses without the reference years find
+        the cached climatology.
+
+        Parameters
+        ----------
+        name : str
+            Name identifying the dataset (e.g. 'baseline', 'EO', a file name).
+        da : xr.DataArray
+            Data (or any object with the same grid) the climatology applies to.
+        reference_period : tuple
+            (start, end) of the reference period.
+        groupby : str, optional
+            'month' or 'dayofyear'.
+        dataset_id : str, optional
+            Identifier of the dataset version; another id gives another climatology.
+        """
+        start, end = (str(pd.Timestamp(t).date()) for t in reference_period)
+        payload = json.dumps([name, str(da.name), start, end, groupby, grid_signature(da),
+                              None if dataset_id is None else str(dataset_id)])
+        return f"{name}_{start}_{end}_{groupby}_{hashlib.sha1(payload.encode()).hexdigest()[:12]}"
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.nc")
+
+    def get_or_compute(self, name: str, da: xr.DataArray, reference_period: tuple,
+                       groupby: str = "month", dataset_id: str = None, **kwargs) -> xr.Dataset:
+        """
+        Load a cached climatology, computing and storing it if missing.
+
+        The fingerprint of the reference-period data is stored with the
+        climatology. When `da` covers the whole reference period again, it is
+        compared to the stored one and a changed dataset is recomputed;
+        otherwise the reference years are not read.
+
+        Parameters
+        ----------
+        name : str
+            Name identifying the dataset.
+        da : xr.DataArray
+            Daily ETa with dims (time, y, x). Only read if the climatology is not
+            cached, or if it covers the reference period.
+        reference_period : tuple
+            (start, end) of the reference period.
+        groupby : str, optional
+            'month' or 'dayofyear'.
+        dataset_id : str, optional
+            Identifier of the dataset version, see `key`.
+        **kwargs
+            Passed to `compute_climatology`.
+
+        Returns
+        -------
+        xr.Dataset
+            The climatology.
+        """
+        path = self.path(self.key(name, da, reference_period, groupby, dataset_id))
+        if os.path.exists(path):
+            ds_clim = xr.load_dataset(path)
+            stored = ds_clim.attrs.get("content_fingerprint")
+            if stored is None or not _covers(da, reference_period) \
+                    or stored == content_fingerprint(da, reference_period):
+                return ds_clim
+            print(f"⚠️ Reference-period data of '{name}' changed, recomputing its climatology.")
+
+        ds_clim = compute_climatology(da, reference_period, groupby=groupby, **kwargs)
+        ds_clim.attrs["content_fingerprint"] = content_fingerprint(da, reference_period)
+        tmp_path = path + ".tmp"
+        ds_clim.to_netcdf(tmp_path)
+        os.replace(tmp_path, path)
+        return ds_clim
+
+
+def _covers(da: xr.DataArray, reference_period: tuple) -> bool:
+    # whether the time axis spans the whole reference period
+    start, end = (np.datetime64(pd.Timestamp(t)) for t in reference_period)
+    times = da["time"].values
+    return times.size > 0 and times.min() <= start and times.max() >= end
@@ -19,12 +19,6 @@ Attributes:
 from dataclasses import dataclass, field
 import xarray as xr
 import numpy as np
-from rich.console import Console
-from dask.diagnostics import ProgressBar
-from rich.panel import Panel
-from rich.logging import RichHandler
-from rich.markdown import Markdown
-from rich.text import Text
 import logging
 import os 
 
@@ -38,10 +32,14 @@ class ETAnalysis:
     threshold_regional: float = 0.25
 
     log_file: str = "ET_analysis_log.md"
-    console: Console = field(default_factory=Console, init=False, repr=False)
+    console: object = field(default=None, init=False, repr=False)  # rich Console
     logger: logging.Logger = field(init=False, repr=False)
 
     def __post_init__(self):
+        from rich.console import Console
+
+        self.console = Console()
+
         # Remove existing log file if it exists
         if os.path.exists(self.log_file):
             os.remove(self.log_file)
@@ -77,6 +75,9 @@ class ETAnalysis:
         
         panel = kwargs.pop('panel', False)
 
+        from rich.panel import Panel
+        from rich.text import Text
+
         if panel:
             toconsole = Panel.fit(
                 f"{title}\n\n{content}",
@@ -134,21 +135,23 @@ class ETAnalysis:
     
         # Check for missing pixels (NaNs in ETa or ETp)
         if self.ETa_name in ds:
-            missing_pixels_ETA = ds[self.ETa_name].isnull().sum().item()
+            missing_pixels_ETA = int(ds[self.ETa_name].isnull().sum())
             if missing_pixels_ETA > 0:
                 issues.append(f"⚠️ ETa contains {missing_pixels_ETA} missing pixels.")
         else:
             issues.append(f"❌ {self.ETa_name} variable is missing in the dataset.")
     
         if self.ETp_name in ds:
-            missing_pixels_ETP = ds[self.ETp_name].isnull().sum().item()
+            missing_pixels_ETP = int(ds[self.ETp_name].isnull().sum())
             if missing_pixels_ETP > 0:
                 issues.append(f"⚠️ ETp contains {missing_pixels_ETP} missing pixels.")
         else:
             issues.append(f"❌ {self.ETp_name} variable is missing in the dataset.")
     
         # Check CRS consistency
-        if not hasattr(ds, 'crs'):
+        import rioxarray  # noqa: F401  (registers the .rio accessor)
+
+        if ds.rio.crs is None:
             issues.append("⚠️ CRS information is missing. Ensure all datasets use the same projection.")
     
         # Print warnings or raise errors
@@ -335,6 +338,8 @@ class ETAnalysis:
                                             {'x': window_cells_x, 
                                              'y': window_cells_y}
                                             )
+            from dask.diagnostics import ProgressBar
+
             with ProgressBar():
                 reg_analysis = ds_analysis.rolling(
                     x=window_cells_x,
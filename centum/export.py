@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Export of centum results to formats consumed by reporting and GIS tools.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def accounting_to_dataframe(ds, zones=None, variables=None, freq='M'):
+    """
+    Convert accounting results to a long table, one row per pixel and period.
+
+    Parameters:
+    - ds: xarray.Dataset with dims (time, y, x), e.g. output of compute_net_irrigation
+    - zones: optional zone raster (y, x) on the same grid; NaN/negative = no zone (-1)
+    - variables: data variables to export, default all (time, y, x) variables
+    - freq: period frequency used to label the time steps
+
+    Returns:
+    - pandas.DataFrame with columns period, zone, y, x and one column per variable;
+      pixels where every variable is NaN are dropped
+    """
+    if variables is None:
+        variables = [v for v in ds.data_vars if set(ds[v].dims) == {'time', 'y', 'x'}]
+
+    ny, nx = ds.sizes['y'], ds.sizes['x']
+    yy, xx = np.meshgrid(ds['y'].values, ds['x'].values, indexing='ij')
+    if zones is not None:
+        zone_values = np.asarray(zones.transpose('y', 'x').values, dtype='float64')
+        zone_values = np.where(np.isfinite(zone_values) & (zone_values >= 0), zone_values, -1)
+        zone_values = zone_values.astype('int64').ravel()
+    else:
+        zone_values = np.full(ny * nx, -1, dtype='int64')
+
+    periods = pd.DatetimeIndex(ds['time'].values).to_period(freq).astype(str)
+    frames = []
+    for i, period in enumerate(periods):
+        columns = {v: np.asarray(ds[v].isel(time=i).transpose('y', 'x').values).ravel() for v in variables}
+        valid = ~np.all([np.isnan(c) for c in columns.values()], axis=0)
+        df = pd.DataFrame({
+            'period': period,
+            'zone': zone_values[valid],
+            'y': yy.ravel()[valid],
+            'x': xx.ravel()[valid],
+            **{v: c[valid] for v, c in columns.items()},
+        })
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def export_accounting_parquet(ds, path, zones=None, variables=None, freq='M',
+                              row_group_size=100_000, compression='zstd', zone_bucket_size=None):
+    """
+    Write accounting results as a Parquet dataset partitioned by period.
+
+    Rows are sorted by zone and pixel within each period, so that the row-group
+    statistics (min/max per column) written by Parquet allow readers to skip
+    row groups when filtering on zones, coordinates or values. Zones are not
+    partitions (parcel-level rasters hold far too many zones for one directory
+    each); with zone_bucket_size, zones are additionally partitioned in buckets
+    of zone_bucket_size consecutive ids ('zone_bucket' = zone // zone_bucket_size).
+
+    Parameters:
+    - ds: xarray.Dataset with dims (time, y, x), e.g. output of compute_net_irrigation
+    - path: output directory of the Parquet dataset
+    - zones: optional zone raster (y, x), stored in the 'zone' column
+    - variables: data variables to export, default all (time, y, x) variables
+    - freq: period frequency used to label the time steps
+    - row_group_size: maximum number of rows per row group
+    - compression: Parquet compression codec
+    - zone_bucket_size: optional number of zone ids per 'zone_bucket' partition
+
+    Returns:
+    - path of the written dataset
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as pds
+
+    partitioning = ['period']
+    if zones is not None and zone_bucket_size is not None:
+        partitioning.append('zone_bucket')
+    os.makedirs(path, exist_ok=True)
+
+    # one period at a time keeps memory bounded to a single time step
+    for i in range(ds.sizes['time']):
+        df = accounting_to_dataframe(ds.isel(time=[i]), zones=zones, variables=variables, freq=freq)
+        if zones is None:
+            df = df.drop(columns='zone')
+        elif zone_bucket_size is not None:
+            df['zone_bucket'] = df['zone'] // int(zone_bucket_size)
+        df = df.sort_values([c for c in ('zone', 'y', 'x') if c in df.columns], kind='stable')
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if 'zone_bucket' in partitioning:
+            # lets query_accounting_parquet prune zone buckets
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                                   'zone_bucket_size': str(int(zone_bucket_size))})
+        pds.write_dataset(
+            table,
+            path,
+            format='parquet',
+            partitioning=partitioning,
+            partitioning_flavor='hive',
+            basename_template=f"part-{df['period'].iloc[0] if len(df) else i}-{{i}}.parquet",
+            existing_data_behavior='delete_matching',
+            max_rows_per_group=row_group_size,
+            min_rows_per_group=min(row_group_size, max(len(df), 1)),
+            file_options=pds.ParquetFileFormat().make_write_options(
+                compression=compression, write_statistics=True
+            ),
+        )
+    return path
+
+
+def query_accounting_parquet(path, periods=None, zones=None, columns=None, filters=None):
+    """
+    Read a subset of an accounting Parquet dataset.
+
+    Partition pruning skips the periods (and zone buckets) that are not
+    requested, and the zone and remaining filters are pushed down to the
+    row-group statistics, so only the needed files, row groups and columns
+    are read.
+
+    Parameters:
+    - path: directory written by export_accounting_parquet
+    - periods: optional list of period labels, e.g. ['2020-01', '2020-02']
+    - zones: optional list of zone ids
+    - columns: optional list of columns to read, default all
+    - filters: optional list of (column, op, value) tuples, e.g. [('volume_mm', '>', 10)]
+
+    Returns:
+    - pandas.DataFrame
+    """
+    import pyarrow.dataset as pds
+
+    dataset = pds.dataset(path, format='parquet', partitioning='hive')
+
+    expression = None
+    conditions = list(filters or [])
+    if periods is not None:
+        conditions.append(('period', 'in', [str(p) for p in periods]))
+    if zones is not None:
+        zones = [int(z) for z in zones]
+        conditions.append(('zone', 'in', zones))
+        metadata = dataset.schema.metadata or {}
+        if b'zone_bucket_size' in metadata:
+            size = int(metadata[b'zone_bucket_size'])
+            conditions.append(('zone_bucket', 'in', sorted({z // size for z in zones})))
+    for column, op, value in conditions:
+        expression = _combine(expression, _filter_expression(column, op, value))
+
+    table = dataset.to_table(columns=columns, filter=expression)
+    if columns is None and 'zone_bucket' in table.column_names:
+        table = table.drop_columns(['zone_bucket'])
+    return table.to_pandas()
+
+
+def _filter_expression(column, op, value):
+    import pyarrow.dataset as pds
+
+    field = pds.field(column)
+    if op == 'in':
+        return field.isin(value)
+    operators = {
+        '==': field.__eq__, '=': field.__eq__, '!=': field.__ne__,
+        '<': field.__lt__, '<=': field.__le__, '>': field.__gt__, '>=': field.__ge__,
+    }
+    if op not in operators:
+        raise ValueError(f"Unsupported filter operator '{op}'.")
+    return operators[op](value)
+
+
+def _combine(expression, other):
+    return other if expression is None else expression & other
+
+
+# Decision cube (ETAnalysis) outputs
+# ----------------------------------
+CATEGORICAL_VARIABLES = ('event_type',)
+RATIO_PREFIX = 'ratio_'
+RATIO_PACKING = (1e-4, 0.0)  # int16 scale_factor, add_offset: +-3.2767, 5e-5 precision
+
+LAYOUTS = ('map', 'timeseries', 'balanced')
+
+
+def decision_chunks(ds, layout='balanced', target_bytes=4_000_000, itemsize=2):
+    """
+    Chunk sizes of a (time, y, x) decision cube tuned for an access pattern.
+
+    Parameters:
+    - ds: xarray.Dataset with dims (time, y, x)
+    - layout: 'map' (one time step per chunk, fast daily maps), 'timeseries'
+      (whole time series per chunk, fast pixel time series) or 'balanced'
+    - target_bytes: approximate uncompressed chunk size
+    - itemsize: bytes per value used to size the chunks
+
+    Returns:
+    - dict dim -> chunk size
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"layout must be one of {LAYOUTS}.")
+    nt, ny, nx = ds.sizes['time'], ds.sizes['y'], ds.sizes['x']
+    values = max(target_bytes // itemsize, 1)
+    if layout == 'map':
+        nt_chunk = 1
+    elif layout == 'timeseries':
+        nt_chunk = nt
+    else:
+        nt_chunk = min(nt, 32)
+    side = max(int(np.sqrt(values / nt_chunk)), 16)
+    return {'time': nt_chunk, 'y': min(ny, side), 'x': min(nx, side)}
+
+
+def decision_encoding(ds, chunks, engine='zarr', compression_level=5, ratio_packing=RATIO_PACKING):
+    """
+    Per-variable encodings of a decision cube.
+
+    - boolean flags (cond*, threshold_*) are stored as int8 0/1 (bit-shuffled),
+      decoded as bool when read with xarray;
+    - categorical variables (event_type) as int8 with -1 as fill value;
+    - ratio variables (ratio_*) as int16 packed with scale_factor/add_offset;
+    - other floats (ETa, ETp) as float32;
+    all compressed (Blosc zstd for Zarr, zlib for NetCDF) and chunked with `chunks`.
+
+    Parameters:
+    - ds: xarray.Dataset, e.g. decision_ds of ETAnalysis.irrigation_delineation
+    - chunks: dict dim -> chunk size, see decision_chunks
+    - engine: 'zarr' or 'netcdf'
+    - compression_level: compression level (1-9)
+    - ratio_packing: (scale_factor, add_offset) of the ratios, or None to keep float32
+
+    Returns:
+    - dict variable -> encoding
+    """
+    encoding = {}
+    for name, da in ds.data_vars.items():
+        if da.ndim == 0:
+            continue
+        # explicit encodings replace the variable ones: keep the CRS reference
+        enc = {k: da.encoding[k] for k in ('grid_mapping',) if k in da.encoding}
+        if da.dtype == bool:
+            kind = 'flag'
+            # 0/1 int8 without fill value; the 'dtype' attribute set by
+            # write_decision_cube lets xarray decode them back to bool
+            enc.update({'dtype': 'int8', '_FillValue': None})
+        elif name in CATEGORICAL_VARIABLES:
+            kind = 'flag'
+            enc.update({'dtype': 'int8', '_FillValue': -1})
+        elif name.startswith(RATIO_PREFIX) and ratio_packing is not None and da.dtype.kind == 'f':
+            kind = 'packed'
+            scale, offset = ratio_packing
+            enc.update({'dtype': 'int16', 'scale_factor': scale, 'add_offset': offset,
+                        '_FillValue': np.int16(-32768)})
+        elif da.dtype.kind == 'f':
+            kind = 'float'
+            enc.update({'dtype': 'float32'})
+        else:
+            kind = 'other'
+
+        var_chunks = tuple(min(chunks.get(d, size), size) for d, size in zip(da.dims, da.shape))
+        if engine == 'zarr':
+            from numcodecs import Blosc
+
+            shuffle = Blosc.BITSHUFFLE if kind == 'flag' else Blosc.SHUFFLE
+            enc.update({'chunks': var_chunks,
+                        'compressor': Blosc(cname='zstd', clevel=compression_level, shuffle=shuffle)})
+        else:
+            enc.update({'chunksizes': var_chunks, 'zlib': True,
+                        'complevel': compression_level, 'shuffle': True})
+        encoding[name] = enc
+    return encoding
+
+
+def write_decision_cube(decision_ds, path, event_type=None, crs=None, layout='balanced', chunks=None,
+                        compression_level=5, ratio_packing=RATIO_PACKING, progress=False, compute=True):
+    """
+    Write ETAnalysis results (decision cube and event types) to Zarr or NetCDF.
+
+    Variables get compact encodings (see decision_encoding) and a chunk layout
+    tuned for map or time-series access. The cube is written chunk by chunk as
+    its (dask) graph is computed, in parallel with the dask scheduler in use,
+    so results are streamed to disk while they are produced.
+
+    Parameters:
+    - decision_ds: xarray.Dataset returned by ETAnalysis.irrigation_delineation
+    - path: output '.zarr' store or '.nc' file
+    - event_type: optional event type DataArray, stored as 'event_type'
+    - crs: CRS written to the output (rioxarray), default is the CRS of decision_ds
+    - layout: 'map', 'timeseries' or 'balanced', see decision_chunks
+    - chunks: optional dict dim -> chunk size overriding the layout
+    - compression_level: compression level (1-9)
+    - ratio_packing: (scale_factor, add_offset) of the ratios, or None to keep
+      float32; ratios outside the int16 range are clipped to it
+    - progress: show a dask progress bar
+    - compute: if False, return the dask delayed write instead of writing
+
+    Returns:
+    - path, or the delayed write if compute is False
+    """
+    import rioxarray  # noqa: F401  (registers the .rio accessor)
+
+    ds = decision_ds.copy()
+    if event_type is not None:
+        ds = ds.assign(event_type=event_type)
+    crs = crs if crs is not None else ds.rio.crs
+    if crs is not None:
+        ds = ds.rio.write_crs(crs)
+
+    if ratio_packing is not None:
+        scale, offset = ratio_packing
+        low, high = offset - 32767 * scale, offset + 32767 * scale
+        for name in ds.data_vars:
+            if name.startswith(RATIO_PREFIX) and ds[name].dtype.kind == 'f':
+                da = ds[name]
+                ds[name] = da.where(np.isfinite(da)).clip(low, high).assign_attrs(da.attrs)
+
+    for name in ds.data_vars:
+        if ds[name].dtype == bool:
+            ds[name] = ds[name].assign_attrs(dtype='bool')
+
+    chunks = {**decision_chunks(ds, layout), **(chunks or {})}
+    ds = ds.chunk({d: c for d, c in chunks.items() if d in ds.dims})
+    for var in ds.variables.values():
+        for key in ('chunks', 'preferred_chunks', 'chunksizes', 'compressor', 'zlib', 'complevel',
+                    'shuffle', 'dtype', 'scale_factor', 'add_offset', '_FillValue'):
+            var.encoding.pop(key, None)
+
+    engine = 'netcdf' if str(path).endswith('.nc') else 'zarr'
+    encoding = decision_encoding(ds, chunks, engine=engine, compression_level=compression_level,
+                                 ratio_packing=ratio_packing)
+    if engine == 'zarr':
+        delayed = ds.to_zarr(path, mode='w', encoding=encoding, compute=False, consolidated=True)
+    else:
+        delayed = ds.to_netcdf(path, encoding=encoding, engine='netcdf4', compute=False)
+
+    if not compute:
+        return delayed
+    if progress:
+        from dask.diagnostics import ProgressBar
+
+        with ProgressBar():
+            delayed.compute()
+    else:
+        delayed.compute()
+    return path
+
+
+# Cloud-optimized GeoTIFFs
+# ------------------------
+COG_NODATA_CATEGORICAL = 255
+AGGREGATIONS = ('sum', 'mean', 'max', 'min')
+
+
+def _cog_array(da, categorical):
+    values = np.asarray(da.values, dtype='float64')
+    if categorical:
+        valid = np.isfinite(values) & (values >= 0) & (values < COG_NODATA_CATEGORICAL)
+        return np.where(valid, values, COG_NODATA_CATEGORICAL).astype('uint8'), COG_NODATA_CATEGORICAL
+    return values.astype('float32'), np.nan
+
+
+def write_cog(da, path, categorical=False, crs=None, colormap=None, blocksize=512,
+              compress='DEFLATE', level=6, resampling=None, num_threads='ALL_CPUS', tags=None):
+    """
+    Write a (y, x) map as a tiled, compressed Cloud-optimized GeoTIFF with
+    internal overviews.
+
+    Tiles and overviews are compressed by GDAL on `num_threads` threads.
+    Categorical maps are stored as uint8 (nodata 255) with a color table and
+    mode-resampled overviews, continuous maps as float32 (nodata NaN) with a
+    floating-point predictor and averaged overviews.
+
+    Parameters:
+    - da: xarray.DataArray (y, x) with its CRS and transform set by rioxarray
+    - path: output .tif file
+    - categorical: True for class maps (e.g. event_type)
+    - crs: CRS of the map, default is da.rio.crs
+    - colormap: optional list of matplotlib colors, category i -> colormap[i] (categorical only)
+    - blocksize: tile size in pixels
+    - compress: GDAL compression ('DEFLATE', 'ZSTD', 'LZW', ...)
+    - level: compression level
+    - resampling: overview resampling, default 'MODE' (categorical) or 'AVERAGE'
+    - num_threads: GDAL threads used to encode tiles and overviews
+    - tags: optional dict of metadata tags
+
+    Returns:
+    - path
+    """
+    import rasterio
+    import rioxarray  # noqa: F401  (registers the .rio accessor)
+
+    if set(da.dims) != {'y', 'x'}:
+        raise ValueError(f"write_cog expects a (y, x) map, got dims {da.dims}.")
+    da = da.transpose('y', 'x')
+    if da.sizes['y'] > 1 and da['y'].values[0] < da['y'].values[-1]:
+        da = da.isel(y=slice(None, None, -1))  # north-up
+
+    crs = crs if crs is not None else da.rio.crs
+    if crs is None:
+        print(f"⚠️ No CRS found for {path}; the GeoTIFF is written without one.")
+    values, nodata = _cog_array(da, categorical)
+    if resampling is None:
+        resampling = 'MODE' if categorical else 'AVERAGE'
+
+    options = {
+        'BLOCKSIZE': blocksize,
+        'COMPRESS': compress,
+        'LEVEL': level,
+        'OVERVIEW_RESAMPLING': resampling,
+        'NUM_THREADS': num_threads,
+        'BIGTIFF': 'IF_SAFER',
+    }
+    if not categorical:
+        options['PREDICTOR'] = 'FLOATING_POINT'
+
+    profile = dict(driver='COG', width=values.shape[1], height=values.shape[0], count=1,
+                   dtype=values.dtype, crs=crs, transform=da.rio.transform(), nodata=nodata)
+    with rasterio.open(path, 'w', **profile, **options) as dst:
+        dst.write(values, 1)
+        if categorical and colormap is not None:
+            from centum.plotting import categorical_lut
+
+            lut = categorical_lut(colormap)
+            dst.write_colormap(1, {i: tuple(int(c) for c in lut[i]) for i in range(len(colormap))})
+        if tags:
+            dst.update_tags(**{k: str(v) for k, v in tags.items()})
+        name = da.name or 'value'
+        dst.set_band_description(1, str(name))
+    return path
+
+
+def export_cog(da, out_dir, times=None, aggregate=None, prefix=None, categorical=False,
+               date_format='%Y-%m-%d', **kwargs):
+    """
+    Export chosen time slices, or their aggregate, of a (time, y, x) cube as COGs.
+
+    Parameters:
+    - da: xarray.DataArray (time, y, x)
+    - out_dir: output directory
+    - times: time steps to export (label, list of labels or slice), default all
+    - aggregate: None (one COG per time step) or 'sum', 'mean', 'max', 'min'
+      (one COG of the aggregate over the selected steps; continuous maps only)
+    - prefix: file name prefix, default da.name
+    - categorical: True for class maps (e.g. event_type)
+    - date_format: strftime format of the dates in the file names
+    - kwargs: passed to write_cog
+
+    Returns:
+    - list of written paths
+    """
+    if aggregate is not None and aggregate not in AGGREGATIONS:
+        raise ValueError(f"aggregate must be one of {AGGREGATIONS}.")
+    if aggregate is not None and categorical:
+        raise ValueError("Categorical maps cannot be aggregated over time.")
+
+    import rioxarray  # noqa: F401  (registers the .rio accessor)
+
+    os.makedirs(out_dir, exist_ok=True)
+    kwargs.setdefault('crs', da.rio.crs)
+    prefix = prefix or da.name or 'map'
+    if times is not None:
+        da = da.sel(time=times)
+        if 'time' not in da.dims:
+            da = da.expand_dims('time')
+    dates = pd.DatetimeIndex(da['time'].values).strftime(date_format)
+
+    base_tags = {'source': 'centum', 'variable': da.name or prefix}
+    base_tags.update({k: v for k, v in da.attrs.items() if k in ('units', 'long_name', 'description')})
+
+    if aggregate is not None:
+        da_agg = getattr(da, aggregate)(dim='time', skipna=True, keep_attrs=True)
+        if aggregate == 'sum':
+            # keep pixels that are NaN on every step as nodata
+            da_agg = da_agg.where(da.notnull().any('time'))
+        path = os.path.join(out_dir, f"{prefix}_{dates[0]}_{dates[-1]}_{aggregate}.tif")
+        tags = {**base_tags, 'aggregate': aggregate, 'start': dates[0], 'end': dates[-1]}
+        return [write_cog(da_agg, path, categorical=False, tags=tags, **kwargs)]
+
+    paths = []
+    for i, date in enumerate(dates):
+        path = os.path.join(out_dir, f"{prefix}_{date}.tif")
+        paths.append(write_cog(da.isel(time=i), path, categorical=categorical,
+                               tags={**base_tags, 'time': date}, **kwargs))
+    print(f"🗺️ {len(paths)} COG(s) written to {out_dir}")
+    return paths
+
+
+def export_event_type_cog(event_type, out_dir, times=None, **kwargs):
+    """
+    Export daily event_type maps (ETAnalysis) as COGs with a color table
+    (0 no input, 1 irrigation, 2 rain; 255 nodata). See export_cog.
+    """
+    from centum.plotting import EVENT_TYPE_COLORS
+
+    kwargs.setdefault('colormap', EVENT_TYPE_COLORS)
+    return export_cog(event_type.rename('event_type'), out_dir, times=times,
+                      categorical=True, **kwargs)
+
+
+def export_volume_mm_cog(ds, out_dir, times=None, aggregate=None, **kwargs):
+    """
+    Export period volume_mm maps (compute_water_accounting) as COGs, one per
+    period or aggregated over the selected periods (e.g. aggregate='sum' for a
+    seasonal total). See export_cog.
+    """
+    kwargs.setdefault('date_format', '%Y-%m')
+    return export_cog(ds['volume_mm'].rename('volume_mm'), out_dir, times=times,
+                      aggregate=aggregate, **kwargs)
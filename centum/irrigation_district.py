@@ -7,14 +7,35 @@ import geopandas as gpd
 import rioxarray
 from dataclasses import dataclass
 from typing import Optional
+import hashlib
+import json
+import os
 import xarray as xr
 from rasterio.features import rasterize
-from geocube.api.core import make_geocube
 
 import rasterio
 import numpy as np
+import pandas as pd
 import xarray as xr
 
+# In-process cache of loaded (and reprojected) shapefiles, least recently
+# used layers are dropped first; the GeoParquet cache of `cache_dir` is unbounded
+_SHAPEFILE_CACHE = {}
+_SHAPEFILE_CACHE_SIZE = 4
+
+
+def _cache_shapefile(key: str, gdf: gpd.GeoDataFrame):
+    _SHAPEFILE_CACHE.pop(key, None)
+    while len(_SHAPEFILE_CACHE) >= _SHAPEFILE_CACHE_SIZE:
+        _SHAPEFILE_CACHE.pop(next(iter(_SHAPEFILE_CACHE)))
+    _SHAPEFILE_CACHE[key] = gdf
+
+
+def clear_shapefile_cache():
+    """Drop the shapefiles cached in memory by `IrrigationDistrict.load_shapefile`."""
+    _SHAPEFILE_CACHE.clear()
+
+
 @dataclass
 class IrrigationDistrict:
     """
@@ -26,27 +47,105 @@ class IrrigationDistrict:
         The path to the irrigation district shapefile.
     crs : str, optional
         The coordinate reference system (CRS) to convert the shapefile to, if needed.
+    cache_dir : str, optional
+        Directory of the rasterization cache. If set, rasters produced by
+        `convert_to_xarray` are stored there and reused across runs.
     """
     shapefile_path: str
     crs: Optional[str] = None  # Optional CRS for reprojecting
+    cache_dir: Optional[str] = None  # Optional rasterization cache
     
-    def load_shapefile(self) -> gpd.GeoDataFrame:
+    def load_shapefile(self,
+                       aoi=None,
+                       columns: list = None,
+                       aoi_crs: str = None) -> gpd.GeoDataFrame:
         """
         Loads the irrigation district shapefile into a GeoDataFrame.
-        
+
+        Only the features intersecting the area of interest and the requested
+        attribute columns are read (columnar Arrow reader when available).
+        The reprojected result is cached in memory, and on disk as GeoParquet
+        when `cache_dir` is set.
+
+        Parameters
+        ----------
+        aoi : tuple or xr.DataArray or xr.Dataset, optional
+            Area of interest, either a bounding box (minx, miny, maxx, maxy) or
+            a rioxarray-enabled dataset whose extent is used. Default is the whole file.
+        columns : list, optional
+            Attribute columns to read. Default is all columns.
+        aoi_crs : str, optional
+            CRS of a bounding-box `aoi`. Default is `crs` if set, else the file CRS.
+
         Returns
         -------
         gpd.GeoDataFrame
             A GeoDataFrame representing the irrigation districts.
         """
+        bbox = None
+        if aoi is not None:
+            if isinstance(aoi, (xr.DataArray, xr.Dataset)):
+                bbox, aoi_crs = tuple(aoi.rio.bounds()), aoi.rio.crs
+            else:
+                bbox = tuple(aoi)
+            bbox = self._bbox_to_file_crs(bbox, aoi_crs if aoi_crs is not None else self.crs)
+            bbox = tuple(float(b) for b in bbox)
+
+        stat = os.stat(self.shapefile_path)
+        key = hashlib.sha1(json.dumps([
+            os.path.abspath(self.shapefile_path), stat.st_size, stat.st_mtime_ns,
+            bbox, sorted(columns) if columns is not None else None, str(self.crs)
+        ]).encode()).hexdigest()
+        if key in _SHAPEFILE_CACHE:
+            gdf = _SHAPEFILE_CACHE[key]
+            _cache_shapefile(key, gdf)
+            return gdf.copy()
+
+        cache_path = None
+        if self.cache_dir is not None:
+            cache_path = os.path.join(self.cache_dir, f"shp_{key}.parquet")
+            if os.path.exists(cache_path):
+                gdf = gpd.read_parquet(cache_path)
+                _cache_shapefile(key, gdf)
+                return gdf.copy()
+
+        read_kwargs = {}
+        if bbox is not None:
+            read_kwargs['bbox'] = bbox
+        if columns is not None:
+            read_kwargs['columns'] = list(columns)
+        try:
+            import pyarrow  # noqa: F401
+            read_kwargs['use_arrow'] = True
+        except ImportError:
+            pass
+
         # Load shapefile into GeoDataFrame
-        gdf = gpd.read_file(self.shapefile_path)
+        gdf = gpd.read_file(self.shapefile_path, **read_kwargs)
         
         if self.crs:
             # If CRS is provided, reproject the GeoDataFrame to the specified CRS
             gdf = gdf.to_crs(self.crs)
+
+        _cache_shapefile(key, gdf)
+        if cache_path is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            gdf.to_parquet(cache_path)
         
-        return gdf
+        return gdf.copy()
+
+    def _bbox_to_file_crs(self, bbox: tuple, bbox_crs) -> tuple:
+        """Transform a bounding box to the CRS of the shapefile."""
+        if bbox_crs is None:
+            return bbox
+        import pyogrio
+        from pyproj import CRS, Transformer
+
+        file_crs = pyogrio.read_info(self.shapefile_path)['crs']
+        if file_crs is None or CRS.from_user_input(file_crs) == CRS.from_user_input(bbox_crs):
+            return bbox
+        transformer = Transformer.from_crs(bbox_crs, file_crs, always_xy=True)
+        return tuple(transformer.transform_bounds(*bbox, densify_pts=21))
     
 
     def convert_to_xarray(self, 
@@ -54,7 +153,8 @@ class IrrigationDistrict:
                           resolution: tuple = (-300, 300), 
                           categorical_enums: dict = None, 
                           crs: str = None, 
-                          engine: str = 'geocube') -> xr.DataArray:
+                          engine: str = 'geocube',
+                          template=None) -> xr.DataArray:
         """
         Convert a GeoDataFrame to a raster using the specified engine.
     
@@ -70,25 +170,42 @@ class IrrigationDistrict:
             The CRS for the output raster. If None, uses the CRS of the input GeoDataFrame.
         engine : str, optional
             The engine to use for conversion, either 'geocube' or 'rasterize'. Default is 'geocube'.
+        template : xr.DataArray or xr.Dataset, optional
+            Existing raster (e.g. the ETa cube) whose transform, shape and CRS
+            are used for the output, so that no `rio.reproject_match` is needed
+            afterwards. `resolution` and `crs` are then ignored.
     
         Returns
         -------
         xr.DataArray
             Rasterized data in the form of an xarray.DataArray.
         """
+        if engine not in ('geocube', 'rasterize'):
+            raise ValueError("Unsupported engine. Choose 'geocube' or 'rasterize'.")
+
+        cache_path = None
+        if self.cache_dir is not None:
+            key = rasterization_cache_key(gdf, resolution, categorical_enums, crs, engine, template)
+            cache_path = os.path.join(self.cache_dir, f"{key}.nc")
+            if os.path.exists(cache_path):
+                return load_cached_raster(cache_path)
+
         if engine == 'geocube':
-            return self.convert_to_xarray_withgeocube(gdf, resolution, categorical_enums, crs)
-        elif engine == 'rasterize':
-            return self.convert_to_xarray_withrasterize(gdf, resolution, categorical_enums, crs)
+            raster = self.convert_to_xarray_withgeocube(gdf, resolution, categorical_enums, crs, template)
         else:
-            raise ValueError("Unsupported engine. Choose 'geocube' or 'rasterize'.")
+            raster = self.convert_to_xarray_withrasterize(gdf, resolution, categorical_enums, crs, template)
+
+        if cache_path is not None:
+            save_cached_raster(raster, cache_path)
+        return raster
     
     
     def convert_to_xarray_withgeocube(self,
                                       gdf: gpd.GeoDataFrame, 
                                       resolution: tuple = (-300, 300), 
                                       categorical_enums: dict = None, 
-                                      crs: str = None) -> xr.DataArray:
+                                      crs: str = None,
+                                      template=None) -> xr.DataArray:
         """
         Convert a GeoDataFrame to a raster using the 'geocube' engine.
     
@@ -102,6 +219,8 @@ class IrrigationDistrict:
             Mapping for categorical variables.
         crs : str, optional
             The CRS for the output raster. If None, uses the CRS of the input GeoDataFrame.
+        template : xr.DataArray or xr.Dataset, optional
+            Existing raster whose grid is used for the output.
     
         Returns
         -------
@@ -113,6 +232,20 @@ class IrrigationDistrict:
         if categorical_enums is None:
             raise ValueError("categorical_enums must be provided for geocube engine.")
     
+        if template is not None:
+            # Burn directly onto the template grid
+            raster = make_geocube(
+                vector_data=gdf.copy(),
+                like=template,
+                categorical_enums=categorical_enums,
+                fill=np.nan
+            )
+            for column in (categorical_enums or {}):
+                if np.issubdtype(raster[column].dtype, np.integer):
+                    dtype = np.promote_types(raster[column].dtype, np.int16)
+                    raster[column] = raster[column].astype(dtype, keep_attrs=True)
+            return raster
+
         # Create the raster grid using geocube
         raster = make_geocube(
             vector_data=gdf.copy(),
@@ -124,6 +257,73 @@ class IrrigationDistrict:
         return raster
 
 
+    def convert_to_xarray_withrasterize(self,
+                                        gdf: gpd.GeoDataFrame,
+                                        resolution: tuple = (-300, 300),
+                                        categorical_enums: dict = None,
+                                        crs: str = None,
+                                        template=None) -> xr.Dataset:
+        """
+        Convert a GeoDataFrame to a categorical raster using rasterio.
+
+        The output follows the geocube convention: each pixel holds the index
+        of its category in the sorted categories, stored in the
+        '<column>_categories' coordinate (with a trailing 'nodata' entry), and
+        pixels outside of every geometry are -1.
+
+        Parameters
+        ----------
+        gdf : gpd.GeoDataFrame
+            The GeoDataFrame representing the spatial data to rasterize.
+        resolution : tuple, optional
+            The (y, x) resolution of the output raster grid, default is (-300, 300).
+        categorical_enums : dict
+            Mapping column -> list of categories, one raster variable per column.
+        crs : str, optional
+            The CRS for the output raster. If None, uses the CRS of the input GeoDataFrame.
+        template : xr.DataArray or xr.Dataset, optional
+            Existing raster whose transform, shape and CRS are used for the output.
+
+        Returns
+        -------
+        xr.Dataset
+            int16 (or int32 for more than 32766 categories) category rasters.
+        """
+        if categorical_enums is None:
+            raise ValueError("categorical_enums must be provided for rasterize engine.")
+
+        transform, shape, out_crs = raster_grid(gdf, resolution, crs, template)
+        if out_crs is not None and gdf.crs is not None and gdf.crs != out_crs:
+            gdf = gdf.to_crs(out_crs)
+
+        y = (transform * (np.zeros(shape[0]), np.arange(shape[0]) + 0.5))[1]
+        x = (transform * (np.arange(shape[1]) + 0.5, np.zeros(shape[1])))[0]
+        if template is not None:
+            y, x = template['y'].values, template['x'].values
+
+        ds = xr.Dataset(coords={'y': y, 'x': x})
+        for column, enums in categorical_enums.items():
+            categories = sorted(set(enums))
+            dtype = np.int16 if len(categories) < np.iinfo(np.int16).max else np.int32
+            codes = pd.Categorical(gdf[column], categories=categories).codes
+            keep = codes >= 0
+            raster = rasterize(
+                zip(gdf.geometry.values[keep], codes[keep]),
+                out_shape=shape,
+                transform=transform,
+                fill=-1,
+                dtype=dtype
+            )
+            ds = ds.assign_coords({f'{column}_categories': categories + ['nodata']})
+            ds[column] = (('y', 'x'), raster)
+            ds[column].attrs.update({'_FillValue': -1,
+                                     'categorical_mapping': f'{column}_categories'})
+
+        if out_crs is not None:
+            ds = ds.rio.write_crs(out_crs)
+        return ds
+
+
 
 
     def convert_to_rioxarray_withrasterize(self, 
@@ -182,27 +382,403 @@ class IrrigationDistrict:
 
 
 
-    def get_irrigation_area(self, gdf: gpd.GeoDataFrame) -> float:
+    def convert_to_rioxarray_withrasterize_tiled(self,
+                                                 gdf: gpd.GeoDataFrame,
+                                                 variable: str,
+                                                 resolution: float,
+                                                 bounds: tuple,
+                                                 tile_size: int = 1024,
+                                                 n_workers: int = None) -> xr.DataArray:
         """
-        Computes the total irrigation area (in square kilometers).
-        
+        Tiled, parallel version of `convert_to_rioxarray_withrasterize` for very large layers.
+
+        Geometries are bucketed into output tiles with an STRtree and each tile
+        is a delayed rasterization task; the tiles are assembled into a dask
+        array (`da.block`), so that no full-size raster is allocated and memory
+        is proportional to the tile size and to the geometries intersecting the
+        tiles being computed. Tiles without geometries are lazy zeros.
+
         Parameters
         ----------
         gdf : gpd.GeoDataFrame
             The GeoDataFrame representing the irrigation districts.
-        
+        variable : str
+            The name of the variable to burn into the raster.
+        resolution : float
+            The spatial resolution of the output raster.
+        bounds : tuple
+            The bounding box of the raster in the format (minx, miny, maxx, maxy).
+        tile_size : int, optional
+            Size in pixels of the (square) output tiles. Default is 1024.
+        n_workers : int, optional
+            If None (default), the raster is returned lazily and its tiles are
+            rasterized in parallel by the active dask scheduler when computed
+            (e.g. written to disk with `to_zarr`). If set, the raster is computed
+            immediately with `n_workers` worker processes.
+
         Returns
         -------
-        float
-            The total area of the irrigation districts in square kilometers.
+        xr.DataArray
+            Same raster as `convert_to_rioxarray_withrasterize`, as a dask array
+            chunked by tile (in memory if `n_workers` is set).
         """
-        # Assuming the GeoDataFrame contains valid geometries, compute the area
-        gdf = gdf.to_crs("EPSG:3395")  # Reproject to meters (using EPSG:3395)
-        area_km2 = gdf.geometry.area.sum() / 1e6  # Convert from square meters to square kilometers
+        import dask
+        import dask.array as dsa
+        from shapely import STRtree, box
+        from rasterio.windows import Window
+        from rasterio.windows import transform as window_transform
+
+        width = int((bounds[2] - bounds[0]) / resolution)
+        height = int((bounds[3] - bounds[1]) / resolution)
+        transform = rasterio.transform.from_bounds(*bounds, width, height)
+
+        geoms = np.asarray(gdf.geometry.values)
+        values = np.asarray(gdf[variable].values)
+        tree = STRtree(geoms)
+
+        blocks = []
+        for row_off in range(0, height, tile_size):
+            row = []
+            for col_off in range(0, width, tile_size):
+                window = Window(col_off, row_off,
+                                min(tile_size, width - col_off),
+                                min(tile_size, height - row_off))
+                shape = (int(window.height), int(window.width))
+                tile_bounds = rasterio.windows.bounds(window, transform)
+                # sorted to keep the burn order (last geometry wins) of the untiled version
+                idx = np.sort(tree.query(box(*tile_bounds)))
+                if idx.size == 0:
+                    row.append(dsa.zeros(shape, dtype=np.int32, chunks=shape))
+                    continue
+                task = (window, window_transform(window, transform), geoms[idx], values[idx])
+                tile = dask.delayed(_rasterize_tile, pure=True)(task)
+                row.append(dsa.from_delayed(tile, shape=shape, dtype=np.int32))
+            blocks.append(row)
+        raster = dsa.block(blocks)
+
+        if n_workers is not None:
+            raster = raster.compute(scheduler='processes' if n_workers > 1 else 'synchronous',
+                                    num_workers=n_workers)
+
+        da = xr.DataArray(
+            raster,
+            dims=("y", "x"),
+            coords={
+                "y": np.linspace(bounds[3], bounds[1], height),
+                "x": np.linspace(bounds[0], bounds[2], width)
+            }
+        )
+
+        if gdf.crs is not None:
+            da = da.rio.write_crs(gdf.crs)
+
+        return da
+
+
+    def convert_to_coverage(self,
+                            gdf: gpd.GeoDataFrame,
+                            zone_column: str = None,
+                            resolution: tuple = (-300, 300),
+                            template=None):
+        """
+        Compute the fractional coverage of raster pixels by the polygons.
+
+        Unlike `convert_to_xarray`, which assigns each pixel to a single
+        polygon, the coverage keeps the fraction of every pixel covered by
+        every zone, so that parcel volumes stay accurate at coarse resolution.
+
+        Parameters
+        ----------
+        gdf : gpd.GeoDataFrame
+            The GeoDataFrame representing the zones.
+        zone_column : str, optional
+            Column holding the zone identifiers. Default is the row position.
+        resolution : tuple, optional
+            The (y, x) resolution of the grid built from the GeoDataFrame
+            extent, default is (-300, 300). Ignored if `template` is given.
+        template : xr.DataArray or xr.Dataset, optional
+            Existing raster (e.g. ETa) whose grid is used.
+
+        Returns
+        -------
+        centum.zonal.ZoneCoverage
+            Sparse (pixel, zone, fraction) coverage, usable with
+            `ZoneCoverage.zonal_sum` / `zonal_mean`.
+        """
+        from centum.zonal import compute_coverage
+
+        transform, shape, crs = raster_grid(gdf, resolution, template=template)
+        if crs is not None and gdf.crs is not None and gdf.crs != crs:
+            gdf = gdf.to_crs(crs)
+
+        return compute_coverage(gdf, transform, shape, zone_column=zone_column, crs=crs)
+
+
+    def get_irrigation_area(self,
+                            gdf: gpd.GeoDataFrame,
+                            by: str = None,
+                            method: str = 'equal_area'):
+        """
+        Computes the irrigation area (in square kilometers), in total or per group.
+
+        Areas are computed per feature in one vectorized pass (see
+        `compute_feature_areas`) and cached per layer, so that several
+        group-by summaries of the same layer cost a single area computation.
+
+        Parameters
+        ----------
+        gdf : gpd.GeoDataFrame
+            The GeoDataFrame representing the irrigation districts.
+        by : str, optional
+            Attribute column to group by (e.g. district or CLC code). Default
+            returns the total area.
+        method : str, optional
+            'equal_area' (Lambert azimuthal equal-area projection centred on
+            the layer) or 'geodesic' (exact areas on the ellipsoid, slower).
         
-        return area_km2
+        Returns
+        -------
+        float or pd.Series
+            The total area of the irrigation districts in square kilometers,
+            or the area per group if `by` is given.
+        """
+        key = f"{gdf_content_hash(gdf, columns=[])}_{method}"
+        areas = _AREA_CACHE.get(key)
+        if areas is None and self.cache_dir is not None:
+            cache_path = os.path.join(self.cache_dir, f"area_{key}.npy")
+            if os.path.exists(cache_path):
+                areas = np.load(cache_path)
+        if areas is None:
+            areas = compute_feature_areas(gdf, method=method)
+            if self.cache_dir is not None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                np.save(os.path.join(self.cache_dir, f"area_{key}.npy"), areas)
+        _AREA_CACHE[key] = areas
+
+        area_km2 = areas / 1e6  # Convert from square meters to square kilometers
+        if by is None:
+            return float(area_km2.sum())
+        return pd.Series(area_km2, index=gdf.index).groupby(gdf[by].values).sum().rename('area_km2')
+
+
+
+def raster_grid(gdf: gpd.GeoDataFrame, resolution: tuple = (-300, 300), crs=None, template=None):
+    """
+    Transform, shape and CRS of the raster grid used to rasterize a GeoDataFrame.
+
+    Parameters
+    ----------
+    gdf : gpd.GeoDataFrame
+        The GeoDataFrame to rasterize.
+    resolution : tuple, optional
+        The (y, x) resolution of a grid built on the GeoDataFrame extent.
+    crs : str, optional
+        CRS of a grid built on the GeoDataFrame extent. Default is the GeoDataFrame CRS.
+    template : xr.DataArray or xr.Dataset, optional
+        Existing raster whose grid is returned instead.
+
+    Returns
+    -------
+    tuple
+        (affine transform, (ny, nx), crs)
+    """
+    if template is not None:
+        return template.rio.transform(), (template.sizes['y'], template.sizes['x']), template.rio.crs
+
+    if crs is not None and gdf.crs is not None and gdf.crs != crs:
+        gdf = gdf.to_crs(crs)
+    res_y, res_x = abs(resolution[0]), abs(resolution[1])
+    minx, miny, maxx, maxy = gdf.total_bounds
+    shape = (max(int(np.ceil((maxy - miny) / res_y)), 1), max(int(np.ceil((maxx - minx) / res_x)), 1))
+    transform = rasterio.transform.from_origin(minx, maxy, res_x, res_y)
+    return transform, shape, crs if crs is not None else gdf.crs
 
 
+def compute_feature_areas(gdf: gpd.GeoDataFrame, method: str = 'equal_area') -> np.ndarray:
+    """
+    Area of every feature in square meters, without reprojecting the GeoDataFrame.
+
+    Parameters
+    ----------
+    gdf : gpd.GeoDataFrame
+        Features with a defined CRS.
+    method : str, optional
+        'equal_area': all vertices are transformed at once to a Lambert
+        azimuthal equal-area projection centred on the layer, and the planar
+        areas are computed vectorized. 'geodesic': exact ellipsoidal areas
+        computed feature by feature with pyproj.Geod.
+
+    Returns
+    -------
+    np.ndarray
+        Areas in m², one per feature.
+    """
+    import shapely
+    from pyproj import CRS, Transformer
+
+    if gdf.crs is None:
+        raise ValueError("The GeoDataFrame has no CRS; areas cannot be computed.")
+    if len(gdf) == 0:
+        return np.zeros(0)
+    geoms = np.asarray(gdf.geometry.values)
+    present = ~(shapely.is_missing(geoms) | shapely.is_empty(geoms))
+    if not present.any():
+        return np.zeros(len(geoms))
+    crs = CRS.from_user_input(gdf.crs)
+    to_lonlat = Transformer.from_crs(crs, crs.geodetic_crs, always_xy=True)
+
+    if method == 'geodesic':
+        geod = crs.get_geod()
+        lonlat = shapely.transform(geoms, lambda xy: np.column_stack(to_lonlat.transform(xy[:, 0], xy[:, 1])))
+        return np.array([abs(geod.geometry_area_perimeter(g)[0]) if g is not None else 0.0 for g in lonlat])
+    if method != 'equal_area':
+        raise ValueError("method must be 'equal_area' or 'geodesic'.")
+
+    # centre of the non-empty geometries
+    minx, miny, maxx, maxy = shapely.total_bounds(geoms[present])
+    lon0, lat0 = to_lonlat.transform((minx + maxx) / 2, (miny + maxy) / 2)
+    laea = CRS.from_proj4(f"+proj=laea +lat_0={lat0} +lon_0={lon0} +datum=WGS84 +units=m")
+    to_laea = Transformer.from_crs(crs, laea, always_xy=True)
+    projected = shapely.transform(geoms, lambda xy: np.column_stack(to_laea.transform(xy[:, 0], xy[:, 1])))
+    return np.nan_to_num(shapely.area(projected))
+
+
+# In-process cache of per-feature areas, keyed by layer content and method
+_AREA_CACHE = {}
+
+
+def _rasterize_tile(task):
+    """Rasterize the geometries of one output tile (worker function)."""
+    window, tile_transform, geoms, values = task
+    return rasterize(
+        zip(geoms, values),
+        out_shape=(int(window.height), int(window.width)),
+        transform=tile_transform,
+        fill=0,
+        dtype=np.int32
+    )
+
+
+def gdf_content_hash(gdf: gpd.GeoDataFrame, columns: list = None) -> str:
+    """
+    Hash of the geometries, CRS and selected attribute columns of a GeoDataFrame.
+
+    Parameters
+    ----------
+    gdf : gpd.GeoDataFrame
+        The GeoDataFrame to hash.
+    columns : list, optional
+        Attribute columns to include. Default is all non-geometry columns.
+
+    Returns
+    -------
+    str
+        Hexadecimal SHA1 digest.
+    """
+    if columns is None:
+        columns = [c for c in gdf.columns if c != gdf.geometry.name]
+    h = hashlib.sha1()
+    h.update(str(gdf.crs).encode())
+    for wkb in gdf.geometry.to_wkb():
+        h.update(wkb if wkb is not None else b'')
+    for column in columns:
+        h.update(column.encode())
+        h.update(gdf[column].astype(str).str.cat(sep='\x1f').encode())
+    return h.hexdigest()
+
+
+def rasterization_cache_key(gdf: gpd.GeoDataFrame,
+                            resolution,
+                            categorical_enums: dict = None,
+                            crs: str = None,
+                            engine: str = 'geocube',
+                            template=None) -> str:
+    """
+    Cache key of a rasterization: content of the attribute columns rasterized,
+    categorical enums and target grid (resolution, CRS, extent, or template grid).
+
+    geocube burns every non-geometry column, so all of them are hashed for that
+    engine; 'rasterize' only burns the `categorical_enums` columns.
+    """
+    from centum.utils import grid_signature
+
+    columns = None
+    if engine != 'geocube' and categorical_enums:
+        columns = sorted(categorical_enums)
+    if template is not None:
+        grid = {'template': grid_signature(template), 'engine': engine}
+    else:
+        grid = {
+            'resolution': [float(r) for r in np.atleast_1d(resolution)],
+            'crs': str(crs if crs else gdf.crs),
+            'bounds': [float(b) for b in gdf.total_bounds],
+            'engine': engine,
+        }
+    enums = {k: [str(v) for v in vals] for k, vals in (categorical_enums or {}).items()}
+    payload = json.dumps([gdf_content_hash(gdf, columns), enums, grid], sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def save_cached_raster(raster, path: str):
+    """
+    Store a zone raster in compact integer form (compressed NetCDF).
+
+    Float variables holding only integer values (NaN = no zone) are packed
+    to int16/int32 with a fill value, and restored to their original dtype by
+    `load_cached_raster`. Object category coordinates (e.g. geocube's
+    '<column>_categories', mixing integer codes and 'nodata') are stored as
+    strings, their original values being kept in an attribute.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    ds = raster.to_dataset(name=raster.name or 'zone') if isinstance(raster, xr.DataArray) else raster
+    ds = ds.copy()
+    ds.attrs['centum_cached_dataarray'] = int(isinstance(raster, xr.DataArray))
+
+    categories = {}
+    for name, coord in ds.coords.items():
+        if coord.dtype == object:
+            categories[name] = [v.item() if isinstance(v, np.generic) else v for v in coord.values]
+            ds = ds.assign_coords({name: coord.astype(str)})
+    ds.attrs['centum_category_coords'] = json.dumps(categories)
+
+    encoding = {}
+    packed = {}
+    for var in ds.data_vars:
+        values = ds[var].values
+        enc = {'zlib': True, 'complevel': 4}
+        if 'grid_mapping' in ds[var].encoding:
+            enc['grid_mapping'] = ds[var].encoding['grid_mapping']
+        if np.issubdtype(values.dtype, np.floating):
+            finite = values[np.isfinite(values)]
+            if finite.size == 0 or np.all(finite == np.round(finite)):
+                vmax = np.abs(finite).max() if finite.size else 0
+                dtype = 'int16' if vmax < np.iinfo('int16').max else 'int32'
+                enc.update({'dtype': dtype, '_FillValue': np.iinfo(dtype).min})
+                ds[var].attrs = {k: v for k, v in ds[var].attrs.items() if k != '_FillValue'}
+                packed[var] = str(values.dtype)
+        encoding[var] = enc
+    ds.attrs['centum_packed_vars'] = json.dumps(packed)
+
+    tmp_path = path + '.tmp'
+    ds.to_netcdf(tmp_path, encoding=encoding)
+    os.replace(tmp_path, path)
+
+
+def load_cached_raster(path: str):
+    """
+    Load a zone raster stored by `save_cached_raster`.
+    """
+    # Integer rasters are kept as stored; only packed float variables are unmasked
+    ds = xr.load_dataset(path, decode_coords='all', mask_and_scale=False)
+    for var, dtype in json.loads(ds.attrs.pop('centum_packed_vars', '{}')).items():
+        fill = ds[var].attrs.pop('_FillValue')
+        ds[var] = ds[var].where(ds[var] != fill).astype(dtype)
+    for name, values in json.loads(ds.attrs.pop('centum_category_coords', '{}')).items():
+        ds = ds.assign_coords({name: np.array(values, dtype=object)})
+    if ds.attrs.pop('centum_cached_dataarray', 0):
+        return ds[list(ds.data_vars)[0]]
+    return ds
+
 
 def get_mask_IN_patch_i(irrigation_map_xr,patchid=0):
     mask_IN = irrigation_map_xr==patchid
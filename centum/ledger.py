@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Incremental, append-only ledger of water accounting period totals.
+
+The ledger keeps per-pixel (and optionally per-zone) period totals of the
+baseline, EO and net irrigation volumes on disk (Zarr). Finished periods are
+never recomputed: only the periods touched by newly ingested days are updated.
+
+Layout of the store::
+
+    <store_path>/
+        ledger.json            manifest (freq, variables, zone signature, period status, days)
+        periods/<label>.zarr   period totals (pixel and zone)
+        open/<label>.zarr      daily staging data of periods still open
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from centum.accounting import compute_water_accounting
+from centum.zonal import ZoneCoverage, zonal_sum
+
+
+COMPONENTS = ("baseline", "EO", "net")
+
+
+def zone_signature(zones) -> Optional[str]:
+    """
+    Hash of a zone raster or zone coverage (zone ids, grid and pixel
+    assignment), None without zones.
+    """
+    if zones is None:
+        return None
+    h = hashlib.sha1()
+    if isinstance(zones, ZoneCoverage):
+        matrix = zones.matrix.tocsr()
+        arrays = (zones.zones, zones.y, zones.x, matrix.indptr, matrix.indices, matrix.data)
+    else:
+        zones = zones.transpose("y", "x")
+        arrays = (np.asarray(zones.values, dtype="float64"), zones["y"].values, zones["x"].values)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        h.update(str((array.dtype, array.shape)).encode())
+        h.update(array.data)
+    return h.hexdigest()
+
+
+@dataclass
+class AccountingLedger:
+    """
+    Append-only store of accounting period totals.
+
+    Attributes
+    ----------
+    store_path : str
+        Directory holding the ledger.
+    freq : str, optional
+        Accounting period frequency (pandas period alias, e.g. 'M'). Default is 'M'.
+    variable : tuple[str, str], optional
+        Names of the ETa variables in the baseline and EO datasets.
+    zones : xr.DataArray or centum.zonal.ZoneCoverage, optional
+        Zone raster (y, x) on the accounting grid, or fractional zone coverage.
+        When given, per-zone totals are stored next to the per-pixel totals.
+        NaN or negative raster values are treated as outside of any zone.
+        A ledger must be reopened with the zones (or no zones) it was created with.
+    logger : logging.Logger, optional
+        Logger used to report ledger updates.
+    """
+    store_path: str
+    freq: str = 'M'
+    variable: tuple = ("ETa", "ETa")
+    zones: Optional[object] = field(default=None, repr=False)
+    logger: logging.Logger = field(default=None, repr=False)
+
+    def __post_init__(self):
+        os.makedirs(os.path.join(self.store_path, "periods"), exist_ok=True)
+        os.makedirs(os.path.join(self.store_path, "open"), exist_ok=True)
+        self.manifest = self._load_manifest()
+
+    # ------------------------------------------------------------------
+    # manifest
+    # ------------------------------------------------------------------
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.store_path, "ledger.json")
+
+    def _load_manifest(self) -> dict:
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if manifest["freq"] != self.freq:
+                raise ValueError(
+                    f"Ledger at {self.store_path} was created with freq='{manifest['freq']}', "
+                    f"not '{self.freq}'."
+                )
+            if manifest["variable"] != list(self.variable):
+                raise ValueError(
+                    f"Ledger at {self.store_path} was created with variable={tuple(manifest['variable'])}, "
+                    f"not {tuple(self.variable)}."
+                )
+            if manifest["zones"] != zone_signature(self.zones):
+                expected = "the same zones" if manifest["zones"] is not None else "no zones"
+                raise ValueError(
+                    f"Ledger at {self.store_path} was created with other zones; reopen it with "
+                    f"{expected} to keep the period totals consistent."
+                )
+            return manifest
+        return {"freq": self.freq, "variable": list(self.variable),
+                "zones": zone_signature(self.zones), "periods": {}}
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _log(self, msg: str):
+        if self.logger:
+            self.logger.info(msg)
+        else:
+            print(msg)
+
+    @property
+    def periods(self) -> dict:
+        """Mapping period label -> status ('open' or 'closed')."""
+        return {label: p["status"] for label, p in sorted(self.manifest["periods"].items())}
+
+    def _period_path(self, label: str, kind: str = "periods") -> str:
+        return os.path.join(self.store_path, kind, f"{label}.zarr")
+
+    # ------------------------------------------------------------------
+    # ingestion
+    # ------------------------------------------------------------------
+    def ingest(self, ds_baseline: xr.Dataset, ds_EO: xr.Dataset) -> list:
+        """
+        Ingest new daily baseline and EO data into the ledger.
+
+        Days falling in closed periods are skipped, days already present in an
+        open period are overwritten, so that re-ingesting overlapping days is
+        idempotent. Only the periods touched by the new days are recomputed.
+
+        Parameters
+        ----------
+        ds_baseline : xr.Dataset
+            Baseline dataset with the baseline ETa variable in mm/day.
+        ds_EO : xr.Dataset
+            EO dataset with the EO ETa variable in mm/day, on the same grid and times.
+
+        Returns
+        -------
+        list
+            Labels of the periods that were updated.
+        """
+        da_baseline = ds_baseline[self.variable[0]].rename("baseline")
+        da_EO = ds_EO[self.variable[1]].rename("EO")
+        ds_new = xr.merge([da_baseline, da_EO], compat="override", join="exact")
+
+        labels = pd.DatetimeIndex(ds_new["time"].values).to_period(self.freq).astype(str)
+        updated = []
+        for label in pd.unique(labels):
+            status = self.manifest["periods"].get(label, {}).get("status")
+            if status == "closed":
+                self._log(f"⏭️ Period {label} is closed, skipping {np.sum(labels == label)} day(s).")
+                continue
+            self._update_open_period(label, ds_new.isel(time=np.flatnonzero(labels == label)))
+            updated.append(label)
+
+        self._save_manifest()
+        return updated
+
+    def _update_open_period(self, label: str, ds_days: xr.Dataset):
+        staging_path = self._period_path(label, "open")
+        if os.path.exists(staging_path):
+            with xr.open_zarr(staging_path) as ds_old:
+                ds_old = ds_old.load()
+            # new days take precedence over previously ingested ones
+            ds_days = ds_days.combine_first(ds_old)
+        ds_days = ds_days.sortby("time").load()
+        ds_days.chunk({"time": -1}).to_zarr(staging_path, mode="w")
+
+        ds_totals = self._compute_period_totals(ds_days)
+        ds_totals.to_zarr(self._period_path(label), mode="w")
+
+        days = [str(d)[:10] for d in ds_days["time"].values]
+        self.manifest["periods"][label] = {"status": "open", "days": days}
+        self._log(f"📥 Period {label} updated ({len(days)} day(s) ingested).")
+
+    def _compute_period_totals(self, ds_days: xr.Dataset) -> xr.Dataset:
+        ds_baseline = compute_water_accounting(ds_days, variable="baseline", freq=self.freq)
+        ds_EO = compute_water_accounting(ds_days, variable="EO", freq=self.freq)
+        ds_net = ds_EO - ds_baseline
+
+        ds_totals = xr.Dataset()
+        for component, ds_c in zip(COMPONENTS, (ds_baseline, ds_EO, ds_net)):
+            for var in ds_c.data_vars:
+                ds_totals[f"{var}_{component}"] = ds_c[var]
+                if self.zones is not None:
+                    ds_totals[f"{var}_{component}_zone"] = zonal_sum(ds_c[var], self.zones)
+        ds_totals.attrs["freq"] = self.freq
+        return ds_totals
+
+    def close(self, until=None) -> list:
+        """
+        Finalise open periods, dropping their daily staging data.
+
+        Parameters
+        ----------
+        until : str or pd.Period, optional
+            Close all open periods up to and including this period. If None,
+            every open period is closed.
+
+        Returns
+        -------
+        list
+            Labels of the periods that were closed.
+        """
+        closed = []
+        for label, period in sorted(self.manifest["periods"].items()):
+            if period["status"] != "open":
+                continue
+            if until is not None and pd.Period(label, self.freq) > pd.Period(until, self.freq):
+                continue
+            shutil.rmtree(self._period_path(label, "open"), ignore_errors=True)
+            period["status"] = "closed"
+            closed.append(label)
+        self._save_manifest()
+        if closed:
+            self._log(f"🔒 Closed period(s): {', '.join(closed)}")
+        return closed
+
+    # ------------------------------------------------------------------
+    # reading
+    # ------------------------------------------------------------------
+    def read(self, component: str = "net", periods: list = None, zones: bool = False) -> xr.Dataset:
+        """
+        Read period totals from the store.
+
+        Parameters
+        ----------
+        component : str, optional
+            One of 'baseline', 'EO' or 'net'. Default is 'net'.
+        periods : list, optional
+            Period labels to read. Default is all periods of the ledger.
+        zones : bool, optional
+            If True, return the per-zone totals instead of the per-pixel ones.
+
+        Returns
+        -------
+        xr.Dataset
+            Dataset with 'volume' and 'volume_mm', as returned by
+            `Accounting.run`, lazily backed by the store.
+        """
+        if component not in COMPONENTS:
+            raise ValueError(f"component must be one of {COMPONENTS}.")
+        if periods is None:
+            periods = sorted(self.manifest["periods"])
+        if len(periods) == 0:
+            raise ValueError("The ledger is empty.")
+
+        suffix = f"_{component}_zone" if zones else f"_{component}"
+        datasets = []
+        for label in periods:
+            ds = xr.open_zarr(self._period_path(label))
+            names = {v: v[: -len(suffix)] for v in ds.data_vars if v.endswith(suffix)}
+            if not names:
+                raise ValueError(f"No {'zone ' if zones else ''}totals stored for period {label}.")
+            datasets.append(ds[list(names)].rename(names))
+        return xr.concat(datasets, dim="time")
@@ -3,20 +3,615 @@
 """
 Functions to plot 
 """
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from matplotlib.colors import Normalize
+import xarray as xr
+
+# matplotlib is imported inside the functions that need it: LUT-based
+# exports and animations only need numpy (and Pillow to encode images).
+
+# Colors and labels of the event types (0 = No input, 1 = irrigation, 2 = rain)
+EVENT_TYPE_COLORS = ['white', 'red', 'blue']
+EVENT_TYPE_LABELS = ['No input', 'irrigation', 'rain']
+
+
+def categorical_lut(colors, nodata_color=(0, 0, 0, 0)):
+    """
+    RGBA lookup table of a categorical raster.
+
+    Parameters:
+    - colors: list of matplotlib colors, one per category (category i -> colors[i])
+    - nodata_color: color of NaN and out-of-range values, appended as the last entry
+
+    Returns:
+    - numpy array (n_categories + 1, 4) of uint8 RGBA
+    """
+    from matplotlib.colors import to_rgba
+
+    lut = np.array([to_rgba(c) for c in list(colors) + [nodata_color]])
+    return np.round(lut * 255).astype(np.uint8)
+
+
+def category_index(values, n_categories):
+    """
+    LUT index of categorical values: the value itself, or n_categories (nodata)
+    for NaN and out-of-range values.
+    """
+    values = np.asarray(values)
+    valid = (values >= 0) & (values < n_categories)
+    if not np.issubdtype(values.dtype, np.integer):
+        valid &= np.isfinite(values)
+    dtype = np.uint8 if n_categories < 255 else np.intp
+    return np.where(valid, values, n_categories).astype(dtype)
+
+
+def colorize_categorical(values, lut):
+    """
+    Color a categorical raster with a LUT (see categorical_lut) in one take.
+
+    Returns:
+    - numpy array (..., 4) of uint8 RGBA
+    """
+    return np.take(lut, category_index(values, len(lut) - 1), axis=0)
+
+
+def continuous_lut(cmap='viridis', n_colors=256, nodata_color=(0, 0, 0, 0)):
+    """
+    RGBA lookup table of a continuous raster.
+
+    Parameters:
+    - cmap: matplotlib colormap or colormap name
+    - n_colors: number of color levels
+    - nodata_color: color of NaN values, appended as the last entry
+
+    Returns:
+    - numpy array (n_colors + 1, 4) of uint8 RGBA
+    """
+    import matplotlib
+    from matplotlib.colors import to_rgba
+
+    cmap = matplotlib.colormaps[cmap] if isinstance(cmap, str) else cmap
+    lut = np.vstack([cmap(np.linspace(0, 1, n_colors)), to_rgba(nodata_color)])
+    return np.round(lut * 255).astype(np.uint8)
+
+
+def continuous_index(values, vmin, vmax, n_colors=256):
+    """
+    LUT index of continuous values scaled between vmin and vmax (clipped), or
+    n_colors (nodata) for NaN values.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    with np.errstate(invalid='ignore'):
+        scaled = (values - vmin) * ((n_colors - 1) / max(vmax - vmin, np.finfo(np.float32).tiny))
+        index = np.clip(np.rint(scaled), 0, n_colors - 1)
+    index = np.where(np.isfinite(values), index, n_colors)
+    return index.astype(np.uint8 if n_colors < 256 else np.uint16)
+
+
+def colorize_continuous(values, lut, vmin, vmax):
+    """
+    Color a continuous raster with a LUT (see continuous_lut) in one take.
+
+    Returns:
+    - numpy array (..., 4) of uint8 RGBA
+    """
+    return np.take(lut, continuous_index(values, vmin, vmax, len(lut) - 1), axis=0)
+
+
+def decimate(values, factor, how='mean', n_categories=None):
+    """
+    Reduce the resolution of (..., y, x) arrays by an integer factor.
+
+    Blocks of factor x factor pixels are aggregated (edges are padded with
+    NaN); NaNs are ignored, all-NaN blocks stay NaN.
+
+    Parameters:
+    - values: numpy array (..., ny, nx)
+    - factor: integer decimation factor
+    - how: 'mean' for continuous data, 'mode' for categorical codes 0..n_categories-1,
+      or 'nearest' (top-left pixel of each block)
+    - n_categories: number of categories, required for 'mode'
+
+    Returns:
+    - numpy array (..., ceil(ny / factor), ceil(nx / factor))
+    """
+    factor = int(factor)
+    if factor <= 1:
+        return values
+    if how == 'nearest':
+        return values[..., ::factor, ::factor]
+
+    values = np.asarray(values, dtype=np.float32)
+    lead = values.shape[:-2]
+    ny, nx = values.shape[-2:]
+    ny_out, nx_out = -(-ny // factor), -(-nx // factor)
+    pad = [(0, 0)] * len(lead) + [(0, ny_out * factor - ny), (0, nx_out * factor - nx)]
+    blocks = np.pad(values, pad, constant_values=np.nan)
+    blocks = blocks.reshape(*lead, ny_out, factor, nx_out, factor)
+    valid = np.isfinite(blocks)
+    count = valid.sum(axis=(-3, -1))
+
+    if how == 'mean':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = np.where(valid, blocks, 0).sum(axis=(-3, -1)) / count
+    elif how == 'mode':
+        if n_categories is None:
+            raise ValueError("n_categories is required for how='mode'.")
+        counts = np.stack([(blocks == c).sum(axis=(-3, -1)) for c in range(n_categories)])
+        out = counts.argmax(axis=0).astype(np.float32)
+    else:
+        raise ValueError("how must be 'mean', 'mode' or 'nearest'.")
+    return np.where(count > 0, out, np.nan)
+
+
+def _index_batches(frames, n_colors, categorical, vmin, vmax, downsample=1, batch_size=8):
+    """
+    Yield LUT indices (batch, y, x) of successive batches of time steps of a
+    (time, y, x) DataArray; only one batch is loaded at a time.
+    """
+    for i0 in range(0, frames.sizes['time'], batch_size):
+        values = frames.isel(time=slice(i0, i0 + batch_size)).values
+        if categorical:
+            values = decimate(values, downsample, how='mode', n_categories=n_colors)
+            yield category_index(values, n_colors)
+        else:
+            values = decimate(values, downsample, how='mean')
+            yield continuous_index(values, vmin, vmax, n_colors)
+
+
+def _write_png(index, lut, path):
+    # runs in worker processes: LUT coloring and PNG encoding only
+    from PIL import Image
+
+    Image.fromarray(np.take(lut, index, axis=0)).save(path)
+    return path
+
+
+def export_frames_png(da, out_dir, lut, categorical=False, vmin=None, vmax=None,
+                      downsample=1, prefix=None, n_workers=None, batch_size=None):
+    """
+    Export every time step of a (time, y, x) DataArray as a PNG image.
+
+    Frames are colored through a LUT straight to RGBA buffers (no matplotlib
+    figure), encoded in a process pool, and read from `da` one batch at a
+    time, so lazily loaded cubes are never fully loaded in memory.
+
+    Parameters:
+    - da: xarray DataArray (time, y, x)
+    - out_dir: output directory
+    - lut: RGBA LUT from categorical_lut or continuous_lut
+    - categorical: True if `da` holds category codes (mode downsampling)
+    - vmin, vmax: color scale of continuous data (required if not categorical)
+    - downsample: integer decimation factor applied before coloring
+    - prefix: file name prefix, default the DataArray name
+    - n_workers: number of processes, default os.cpu_count(); 1 runs in-process
+    - batch_size: number of frames loaded at once, default 4 * n_workers
+
+    Returns:
+    - list of the written file paths
+    """
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+
+    if not categorical and (vmin is None or vmax is None):
+        raise ValueError("vmin and vmax are required for continuous data.")
+    n_workers = n_workers or os.cpu_count() or 1
+    batch_size = batch_size or 4 * n_workers
+    prefix = prefix or (da.name or 'frame')
+    os.makedirs(out_dir, exist_ok=True)
+
+    n_colors = len(lut) - 1
+    frames = _north_up(da)
+    labels = _time_labels(frames)
+    if len(set(labels)) < len(labels):
+        labels = [f'{i:05d}' for i in range(len(labels))]
+    paths = [os.path.join(out_dir, f'{prefix}_{label}.png') for label in labels]
+
+    batches = _index_batches(frames, n_colors, categorical, vmin, vmax, downsample, batch_size)
+    executor = ProcessPoolExecutor(max_workers=n_workers) if n_workers > 1 else None
+    try:
+        for i0, index in zip(range(0, len(paths), batch_size), batches):
+            batch_paths = paths[i0:i0 + batch_size]
+            if executor is None:
+                for frame, path in zip(index, batch_paths):
+                    _write_png(frame, lut, path)
+            else:
+                list(executor.map(_write_png, index, [lut] * len(batch_paths), batch_paths))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return paths
+
+
+def export_event_maps(event_type, out_dir, downsample=1, n_workers=None, **kwargs):
+    """
+    Export daily event type maps (0 = No input, 1 = irrigation, 2 = rain) as PNGs,
+    with the colors of plot_irrigation_schedule. See export_frames_png.
+    """
+    lut = categorical_lut(EVENT_TYPE_COLORS)
+    kwargs.setdefault('prefix', 'event_type')
+    return export_frames_png(event_type, out_dir, lut, categorical=True,
+                             downsample=downsample, n_workers=n_workers, **kwargs)
+
+
+def export_ratio_maps(ratio, out_dir, vmin=0, vmax=1, cmap='RdYlGn', downsample=1,
+                      n_workers=None, **kwargs):
+    """
+    Export daily ETa/ETp ratio maps (e.g. ratio_ETap_local) as PNGs on a fixed
+    color scale. See export_frames_png.
+    """
+    lut = continuous_lut(cmap)
+    kwargs.setdefault('prefix', 'ratio_ETap_local')
+    return export_frames_png(ratio, out_dir, lut, vmin=vmin, vmax=vmax,
+                             downsample=downsample, n_workers=n_workers, **kwargs)
+
+
+def _write_gif(path, index_frames, lut, interval=200, loop=0):
+    """
+    Write frames of LUT indices as an animated GIF, one frame at a time.
+
+    The LUT is used as the global palette, so frames are encoded without
+    quantization; the first fully transparent LUT entry is the transparent color.
+    """
+    from PIL import Image, GifImagePlugin
+
+    palette = lut[:, :3].tobytes()
+    transparent = np.flatnonzero(lut[:, 3] == 0)
+    transparent = int(transparent[0]) if transparent.size else None
+    packed = (2 << 2) | 1 if transparent is not None else (1 << 2)
+    gce = (b'\x21\xf9\x04' + bytes([packed])
+           + int(round(interval / 10)).to_bytes(2, 'little')
+           + bytes([transparent or 0]) + b'\x00')
+
+    n_frames = 0
+    with open(path, 'wb') as fp:
+        for index in index_frames:
+            im = Image.fromarray(np.ascontiguousarray(index, dtype=np.uint8))
+            im.putpalette(palette)
+            if n_frames == 0:
+                header, _ = GifImagePlugin.getheader(im, info={'loop': loop, 'optimize': False})
+                fp.write(b''.join(header))
+            fp.write(gce)
+            fp.write(b''.join(GifImagePlugin.getdata(im, optimize=False)))
+            n_frames += 1
+        fp.write(b';')
+    return n_frames
+
+
+def _png_chunk(tag, data):
+    import struct
+    import zlib
+
+    return (struct.pack('>I', len(data)) + tag + data
+            + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+
+def _write_apng(path, index_frames, lut, n_frames, interval=200, loop=0):
+    """
+    Write frames of LUT indices as an animated PNG (indexed colors), one frame at a time.
+    """
+    import struct
+    import zlib
+
+    sequence = 0
+    with open(path, 'wb') as fp:
+        for i, index in enumerate(index_frames):
+            index = np.ascontiguousarray(index, dtype=np.uint8)
+            height, width = index.shape
+            if i == 0:
+                fp.write(b'\x89PNG\r\n\x1a\n')
+                fp.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0)))
+                fp.write(_png_chunk(b'acTL', struct.pack('>II', n_frames, loop)))
+                fp.write(_png_chunk(b'PLTE', lut[:, :3].tobytes()))
+                fp.write(_png_chunk(b'tRNS', lut[:, 3].tobytes()))
+            fp.write(_png_chunk(b'fcTL', struct.pack('>IIIIIHHBB', sequence, width, height, 0, 0,
+                                                     int(interval), 1000, 0, 0)))
+            sequence += 1
+            # filter type 0 (None) at the start of every scanline
+            scanlines = np.hstack([np.zeros((height, 1), dtype=np.uint8), index]).tobytes()
+            data = zlib.compress(scanlines, 6)
+            if i == 0:
+                fp.write(_png_chunk(b'IDAT', data))
+            else:
+                fp.write(_png_chunk(b'fdAT', struct.pack('>I', sequence) + data))
+                sequence += 1
+        fp.write(_png_chunk(b'IEND', b''))
+
+
+def write_animation(da, path, categorical=False, lut=None, cmap='viridis', vmin=None, vmax=None,
+                    interval=200, loop=0, downsample=1, batch_size=8, n_workers=None):
+    """
+    Write an animation of a (time, y, x) DataArray with constant memory.
+
+    Frames are read from `da` one batch at a time (lazily loaded cubes are
+    never fully loaded), colored through a precomputed LUT and appended to the
+    output file as they are produced.
+
+    Parameters:
+    - da: xarray DataArray (time, y, x), e.g. ETa or event_type
+    - path: output file; '.gif' for an animated GIF, '.png'/'.apng' for an
+      animated PNG, or a directory for a PNG frame sequence (see export_frames_png)
+    - categorical: True if `da` holds category codes, e.g. event_type
+    - lut: RGBA LUT of at most 256 entries; default the event type colors for
+      categorical data, else `cmap` with 255 levels
+    - cmap: colormap of continuous data
+    - vmin, vmax: color scale of continuous data, default the data range
+      (computed lazily in one pass)
+    - interval: delay between frames in milliseconds
+    - loop: number of loops, 0 = infinite
+    - downsample: integer decimation factor applied before coloring
+    - batch_size: number of frames loaded at once
+    - n_workers: processes used for a PNG frame sequence
+
+    Returns:
+    - path
+    """
+    import os
+
+    if lut is None:
+        lut = categorical_lut(EVENT_TYPE_COLORS) if categorical else continuous_lut(cmap, n_colors=255)
+    if not categorical and (vmin is None or vmax is None):
+        vmin = float(da.min()) if vmin is None else vmin
+        vmax = float(da.max()) if vmax is None else vmax
+
+    extension = os.path.splitext(str(path))[1].lower()
+    if extension not in ('.gif', '.png', '.apng'):
+        export_frames_png(da, path, lut, categorical=categorical, vmin=vmin, vmax=vmax,
+                          downsample=downsample, n_workers=n_workers, batch_size=batch_size)
+        return path
+
+    if len(lut) > 256:
+        raise ValueError("Animated GIF/PNG need a LUT of at most 256 entries.")
+    frames = _north_up(da)
+    batches = _index_batches(frames, len(lut) - 1, categorical, vmin, vmax, downsample, batch_size)
+    index_frames = (index for batch in batches for index in batch)
+    if extension == '.gif':
+        _write_gif(path, index_frames, lut, interval=interval, loop=loop)
+    else:
+        _write_apng(path, index_frames, lut, frames.sizes['time'], interval=interval, loop=loop)
+    return path
+
+
+_OVERVIEW_CACHE = {}
+_OVERVIEW_CACHE_SIZE = 16
+
+
+def clear_overview_cache():
+    """Drop the cached overviews built by get_overview."""
+    _OVERVIEW_CACHE.clear()
+
+
+def _decimate_coord(values, factor):
+    # coordinates of the centres of the decimated pixels
+    n_out = -(-values.size // factor)
+    step = values[1] - values[0] if values.size > 1 else 0
+    return values[0] + (np.arange(n_out) * factor + (factor - 1) / 2) * step
+
+
+def get_overview(da, factor, how='mean', n_categories=None):
+    """
+    Overview of a (..., y, x) DataArray decimated by a power-of-two factor.
+
+    Overviews form a pyramid cached per DataArray (dask token of its data and
+    coordinates): each level is built from the finest cached level it can be
+    derived from, and later plots of the same cube reuse them. Frames (e.g.
+    time steps) are loaded and decimated one at a time, so that peak memory
+    is one full-resolution frame plus the overview.
+
+    Parameters:
+    - da: xarray DataArray with 'y' and 'x' dims
+    - factor: decimation factor (rounded down to a power of two)
+    - how: 'mean' for continuous data, 'mode' for categorical codes
+    - n_categories: number of categories, required for 'mode'
+
+    Returns:
+    - xarray DataArray on the decimated grid (da itself for factor 1)
+    """
+    from dask.base import tokenize
+
+    level = int(np.log2(max(int(factor), 1)))
+    if level == 0:
+        return da
+
+    token = tokenize(da, how, n_categories)
+    source, source_level = da, 0
+    for finer in range(level, 0, -1):
+        if (token, finer) in _OVERVIEW_CACHE:
+            source, source_level = _OVERVIEW_CACHE[(token, finer)], finer
+            break
+    if source_level == level:
+        return source
+
+    step = 2 ** (level - source_level)
+    dims = [d for d in source.dims if d not in ('y', 'x')] + ['y', 'x']
+    source = source.transpose(*dims)
+    lead_shape = tuple(source.sizes[d] for d in dims[:-2])
+    ny_out, nx_out = -(-source.sizes['y'] // step), -(-source.sizes['x'] // step)
+    values = np.empty(lead_shape + (ny_out, nx_out), dtype=np.float32)
+    for index in np.ndindex(*lead_shape):
+        frame = source.isel(dict(zip(dims[:-2], index))).values
+        values[index] = decimate(frame, step, how=how, n_categories=n_categories)
+    overview = xr.DataArray(
+        values,
+        dims=dims,
+        coords={**{d: source[d] for d in dims[:-2] if d in source.coords},
+                'y': _decimate_coord(source['y'].values, step),
+                'x': _decimate_coord(source['x'].values, step)},
+        name=da.name,
+        attrs=da.attrs,
+    )
+
+    if len(_OVERVIEW_CACHE) >= _OVERVIEW_CACHE_SIZE:
+        _OVERVIEW_CACHE.pop(next(iter(_OVERVIEW_CACHE)))
+    _OVERVIEW_CACHE[(token, level)] = overview
+    return overview
+
+
+def overview_factor(ax, shape, tiles=(1, 1)):
+    """
+    Largest power-of-two decimation factor keeping at least one raster pixel
+    per screen pixel of the Axes, given the figure DPI and Axes size.
+
+    Parameters:
+    - ax: matplotlib Axes
+    - shape: (ny, nx) of the raster
+    - tiles: (nrows, ncols) of rasters tiled in the Axes, e.g. a mosaic
+
+    Returns:
+    - int factor >= 1
+    """
+    extent = ax.get_window_extent()
+    height_px = max(extent.height / tiles[0], 1)
+    width_px = max(extent.width / tiles[1], 1)
+    ratio = min(shape[0] / height_px, shape[1] / width_px)
+    return 2 ** int(np.floor(np.log2(ratio))) if ratio >= 2 else 1
+
+
+def _resolve_overview(da, ax, overview, how, n_categories=None, tiles=(1, 1)):
+    if overview is None or overview is False:
+        return da
+    if overview == 'auto':
+        factor = overview_factor(ax, (da.sizes['y'], da.sizes['x']), tiles=tiles)
+    else:
+        factor = int(overview)
+    return get_overview(da, factor, how=how, n_categories=n_categories)
+
+
+def tile_mosaic(frames, ncols, fill=0):
+    """
+    Tile frames (n, ny, nx, ...) into a single (nrows * ny, ncols * nx, ...) array,
+    row by row; missing tiles of the last row are filled with `fill`.
+    """
+    n, ny, nx = frames.shape[:3]
+    nrows = int(np.ceil(n / ncols))
+    missing = nrows * ncols - n
+    if missing:
+        frames = np.concatenate([frames, np.full((missing,) + frames.shape[1:], fill, dtype=frames.dtype)])
+    mosaic = frames.reshape(nrows, ncols, ny, nx, *frames.shape[3:]).swapaxes(1, 2)
+    return mosaic.reshape(nrows * ny, ncols * nx, *frames.shape[3:])
+
+
+def _north_up(da):
+    """Frames (time, y, x) of a DataArray with the first row at the top (north)."""
+    da = da.transpose('time', 'y', 'x')
+    if da.sizes['y'] > 1 and da['y'].values[0] < da['y'].values[-1]:
+        da = da.isel(y=slice(None, None, -1))
+    return da
+
+
+def _time_labels(da):
+    if 'time' in da.coords and np.issubdtype(da['time'].dtype, np.datetime64):
+        return [str(t)[:10] for t in da['time'].values]
+    return [str(i) for i in range(da.sizes['time'])]
+
+
+def plot_irrigation_schedule_mosaic(event_type, time_steps, fig, ax, ncols=None, overview='auto'):
+    """
+    Plot the irrigation schedule of several time steps as a single image.
+
+    The time steps are tiled into one RGB array, colored through a LUT, and
+    drawn with a single imshow, which keeps rendering cheap for full seasons.
+
+    Parameters:
+    - event_type: xarray DataArray (time, y, x) of event types (0, 1, 2, NaN)
+    - time_steps: number of time steps to plot, from the first one
+    - fig: matplotlib Figure
+    - ax: matplotlib Axes holding the mosaic
+    - ncols: number of tiles per row, default ~sqrt(time_steps)
+    - overview: 'auto' to draw a cached overview matching the tile size on
+      screen (see get_overview), an integer decimation factor, or None for
+      full resolution
+
+    Returns:
+    - the AxesImage of the mosaic
+    """
+    import matplotlib.pyplot as plt
+
+    if ncols is None:
+        ncols = int(np.ceil(np.sqrt(time_steps)))
+    frames = event_type.isel(time=slice(0, time_steps))
+    tiles = (int(np.ceil(frames.sizes['time'] / ncols)), ncols)
+    frames = _resolve_overview(frames, ax, overview, 'mode', len(EVENT_TYPE_COLORS), tiles=tiles)
+    frames = _north_up(frames)
+    labels = _time_labels(frames)
+    lut = categorical_lut(EVENT_TYPE_COLORS)
+
+    index = category_index(frames.values, len(EVENT_TYPE_COLORS))
+    mosaic = np.take(lut, tile_mosaic(index, ncols, fill=len(lut) - 1), axis=0)
+
+    ny, nx = frames.sizes['y'], frames.sizes['x']
+    nrows = int(np.ceil(len(labels) / ncols))
+    img = ax.imshow(mosaic, extent=(0, ncols * nx, nrows * ny, 0), interpolation='nearest')
+
+    # tile grid; rows are labelled with their first time step, columns with
+    # the offset (in time steps) from it
+    for i in range(1, ncols):
+        ax.axvline(i * nx, color='grey', lw=0.5)
+    for j in range(1, nrows):
+        ax.axhline(j * ny, color='grey', lw=0.5)
+    ax.set_xticks((np.arange(ncols) + 0.5) * nx)
+    ax.set_xticklabels([f'+{i}' for i in range(ncols)], fontsize=7)
+    ax.set_yticks((np.arange(nrows) + 0.5) * ny)
+    ax.set_yticklabels(labels[::ncols], fontsize=7)
+
+    plt.tight_layout()
+
+    cmap = plt.cm.colors.ListedColormap(EVENT_TYPE_COLORS)
+    cbar = fig.colorbar(plt.cm.ScalarMappable(cmap=cmap,
+                                              norm=plt.Normalize(vmin=-0.5, vmax=2.5)
+                                              ),
+                        ax=ax,
+                        orientation='horizontal',
+                        fraction=0.02, pad=0.04)
+    cbar.set_ticks([0, 1, 2])
+    cbar.set_ticklabels(EVENT_TYPE_LABELS)
+    return img
+
 
 #%%
-def plot_irrigation_schedule(event_type,time_steps,fig,axes):
-        
+def plot_irrigation_schedule(event_type,time_steps,fig,axes,mosaic=False,ncols=None,overview='auto'):
+    """
+    Plot the irrigation schedule (event types) of the first time steps.
+
+    Parameters:
+    - event_type: xarray DataArray (time, y, x) of event types
+    - time_steps: number of time steps to plot
+    - fig: matplotlib Figure
+    - axes: array of Axes, one per time step (or a single Axes with mosaic=True)
+    - mosaic: if True, draw all time steps as one tiled image (see
+      plot_irrigation_schedule_mosaic), much faster for long periods; a grid
+      of Axes is replaced by a single Axes spanning it
+    - ncols: tiles per row in mosaic mode, default the number of columns of axes
+    - overview: 'auto' to draw a cached overview (mode aggregation) matching
+      the figure DPI and Axes size, an integer decimation factor, or None for
+      full resolution
+    """
+    import matplotlib.pyplot as plt
+
+    if mosaic:
+        axes = np.atleast_1d(axes)
+        if ncols is None and axes.ndim == 2:
+            ncols = axes.shape[1]
+        axes = axes.flatten()
+        ax = axes[0]
+        if axes.size > 1:
+            # replace the grid by one Axes spanning it, so that the mosaic
+            # (and its overview) gets the whole area
+            specs = [a.get_subplotspec() for a in axes]
+            rows = [r for spec in specs for r in spec.rowspan]
+            cols = [c for spec in specs for c in spec.colspan]
+            gridspec = specs[0].get_gridspec()
+            for a in axes:
+                a.remove()
+            ax = fig.add_subplot(gridspec[min(rows):max(rows) + 1, min(cols):max(cols) + 1])
+        return plot_irrigation_schedule_mosaic(event_type, time_steps, fig, ax, ncols=ncols,
+                                               overview=overview)
+
     axes = axes.flatten()  # Flatten to easily iterate over
+    event_type = _resolve_overview(event_type.isel(time=slice(0, time_steps)), axes[0], overview,
+                                   'mode', len(EVENT_TYPE_COLORS))
     # Custom colormap with discrete colors corresponding to 'No input', 'irrigation', 'rain'
-    cmap = plt.cm.colors.ListedColormap(['white', 
-                                         'red', 
-                                         'blue'
-                                         ])
+    cmap = plt.cm.colors.ListedColormap(EVENT_TYPE_COLORS)
     x_values = event_type['x'].values
     y_values = event_type['y'].values
     extent = [x_values.min(), x_values.max(), y_values.min(), y_values.max()]
@@ -50,36 +645,102 @@ def plot_irrigation_schedule(event_type,time_steps,fig,axes):
                         orientation='horizontal', 
                         fraction=0.02, pad=0.04)  # Adjust placement
     cbar.set_ticks([0, 1, 2])
-    cbar.set_ticklabels(['No input', 'irrigation', 'rain'])
+    cbar.set_ticklabels(EVENT_TYPE_LABELS)
     
     pass
 
 
 
 
-def plot_monthly_volume_mm(ds, variable='volume_mm',axs=None, cmap='viridis'):
-    time_index = pd.to_datetime(ds.time.values)
-    months = time_index.to_period('M').unique()
-    axsf = axs.flatten()
+def alpha_ramp_lut(cmap='viridis', n_colors=256, min_alpha=0.05, nodata_color=(0, 0, 0, 0)):
+    """
+    continuous_lut whose opacity grows with the value, from min_alpha at the
+    bottom of the scale to 1 at the top (low values fade out).
+    """
+    lut = continuous_lut(cmap, n_colors=n_colors, nodata_color=nodata_color)
+    alpha = np.clip(np.linspace(0, 1, n_colors), min_alpha, 1.0)
+    lut[:n_colors, 3] = np.round(alpha * 255).astype(np.uint8)
+    return lut
 
-    vmin = 0
-    vmax = float(ds[variable].max())
-    norm = Normalize(vmin=vmin, vmax=vmax)
 
-    for i, month in enumerate(months):
-        mask = time_index.to_period('M') == month
-        data = ds[variable].sel(time=mask).squeeze().values
+def group_time_indices(time_values, freq='M'):
+    """
+    Group time steps by period in one pass.
+
+    Parameters:
+    - time_values: datetime-like array
+    - freq: pandas period alias, e.g. 'M'
+
+    Returns:
+    - periods: pandas PeriodIndex of the unique periods, in time order
+    - codes: numpy array, index in `periods` of every time step
+    """
+    codes, periods = pd.factorize(pd.DatetimeIndex(time_values).to_period(freq), sort=True)
+    return periods, codes
+
+
+def period_rgba(da, lut, vmin, vmax, freq='M'):
+    """
+    Color every period of a (time, y, x) DataArray in one batched LUT lookup.
+
+    Time steps are grouped by period once; periods with several time steps
+    are summed (NaN where every step is NaN).
+
+    Parameters:
+    - da: xarray DataArray (time, y, x)
+    - lut: RGBA LUT, e.g. from continuous_lut or alpha_ramp_lut
+    - vmin, vmax: color scale
+    - freq: pandas period alias
+
+    Returns:
+    - periods: pandas PeriodIndex
+    - rgba: numpy array (period, y, x, 4) of uint8
+    """
+    periods, codes = group_time_indices(da['time'].values, freq)
+    values = da.transpose('time', 'y', 'x').values
+    if len(codes) != len(periods):
+        valid = np.isfinite(values)
+        totals = np.zeros((len(periods),) + values.shape[1:])
+        counts = np.zeros(totals.shape, dtype=np.int64)
+        np.add.at(totals, codes, np.where(valid, values, 0))
+        np.add.at(counts, codes, valid)
+        values = np.where(counts > 0, totals, np.nan)
+    else:
+        values = values[np.argsort(codes)]
+    return periods, colorize_continuous(values, lut, vmin, vmax)
 
-        alpha = np.clip((data - vmin) / (vmax - vmin), 0.05, 1.0)
-        rgba = plt.cm.get_cmap(cmap)(norm(data))
-        rgba[..., -1] = alpha
 
-        axsf[i].imshow(rgba, aspect='auto')
+def plot_monthly_volume_mm(ds, variable='volume_mm',axs=None, cmap='viridis', overview='auto',
+                           vmin=0, vmax=None):
+    """
+    Plot one map per month of a monthly variable, e.g. volume_mm.
+
+    All months are colored at once through a LUT (opacity growing with the
+    value) into a (month, y, x, 4) RGBA array, then drawn panel by panel.
+
+    With overview='auto' (default), a cached overview (mean aggregation)
+    matching the figure DPI and Axes size is drawn instead of the full
+    resolution raster; pass an integer decimation factor, or None for full
+    resolution. The color scale (vmin, default 0, and vmax, default the
+    maximum of the full resolution data) does not depend on the overview.
+    """
+    from matplotlib.colors import Normalize
+
+    axsf = np.atleast_1d(axs).flatten()
+    if vmax is None:
+        vmax = float(ds[variable].max())
+    norm = Normalize(vmin=vmin, vmax=vmax)
+    da = _resolve_overview(ds[variable], axsf[0], overview, 'mean')
+
+    months, rgba = period_rgba(da, alpha_ramp_lut(cmap), vmin, vmax, freq='M')
+
+    for i, month in enumerate(months):
+        axsf[i].imshow(rgba[i], aspect='auto')
         axsf[i].set_title(month.strftime('%B %Y'))
         axsf[i].set_yticks([])
 
-    for j in range(i + 1, np.shape(axs)[0] * np.shape(axs)[1]):
-        axsf[j].axis('off')
+    for ax in axsf[len(months):]:
+        ax.axis('off')
 
     return norm
 
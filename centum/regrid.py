@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Regridding between raster grids with a precomputed source -> target mapping.
+
+The mapping (for every target pixel, the source pixel it takes its value
+from) is computed once per pair of grids from the grid metadata only, can be
+cached on disk, and is then applied to any number of variables and time
+steps as a single gather. Coarsening can alternatively aggregate all the fine
+pixels of each coarse pixel (AggregationRegridder), which conserves totals.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+import xarray as xr
+
+from centum.utils import grid_signature
+
+
+@dataclass
+class Regridder:
+    """
+    Nearest-neighbour regridder from a source grid to a target grid.
+
+    Attributes
+    ----------
+    index : np.ndarray
+        Flat source pixel index of every target pixel (-1 = outside source), shape (ny * nx,)
+        of the target grid.
+    source_shape : tuple
+        (ny, nx) of the source grid.
+    target_y, target_x : np.ndarray
+        Coordinates of the target grid.
+    target_crs : str, optional
+        CRS of the target grid.
+    """
+    index: np.ndarray
+    source_shape: tuple
+    target_y: np.ndarray = field(repr=False)
+    target_x: np.ndarray = field(repr=False)
+    target_crs: Optional[str] = None
+
+    @property
+    def target_shape(self) -> tuple:
+        return (self.target_y.size, self.target_x.size)
+
+    @classmethod
+    def from_grids(cls, ds_source, ds_target, cache_dir: str = None) -> "Regridder":
+        """
+        Build (or load from cache) the regridder between two grids.
+
+        Parameters
+        ----------
+        ds_source : xr.Dataset or xr.DataArray
+            Dataset on the source grid, with 'y'/'x' coordinates and a rioxarray CRS.
+        ds_target : xr.Dataset or xr.DataArray
+            Dataset on the target grid.
+        cache_dir : str, optional
+            Directory where the mapping is cached, keyed by the signatures of both grids.
+
+        Returns
+        -------
+        Regridder
+        """
+        target_crs = ds_target.rio.crs
+        target_y = np.asarray(ds_target["y"].values)
+        target_x = np.asarray(ds_target["x"].values)
+        source_shape = (ds_source.sizes["y"], ds_source.sizes["x"])
+
+        path = None
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            key = f"{grid_signature(ds_source)}_{grid_signature(ds_target)}_nearest"
+            path = os.path.join(cache_dir, f"{key}.npz")
+            if os.path.exists(path):
+                with np.load(path) as cached:
+                    return cls(cached["index"], source_shape, target_y, target_x,
+                               str(target_crs) if target_crs else None)
+
+        index = nearest_index(ds_source, ds_target)
+        if path is not None:
+            tmp_path = path + ".tmp.npz"
+            np.savez(tmp_path, index=index)
+            os.replace(tmp_path, path)
+        return cls(index, source_shape, target_y, target_x,
+                   str(target_crs) if target_crs else None)
+
+    def _gather(self, values: np.ndarray) -> np.ndarray:
+        lead = values.shape[:-2]
+        flat = values.reshape(*lead, -1)
+        out = np.take(flat, np.maximum(self.index, 0), axis=-1)
+        outside = self.index < 0
+        if outside.any():
+            out = out.astype(np.result_type(out.dtype, np.float32))
+            out[..., outside] = np.nan
+        return out.reshape(*lead, *self.target_shape)
+
+    def apply(self, obj):
+        """
+        Regrid a DataArray or every spatial variable of a Dataset.
+
+        Dask-backed inputs stay lazy: the gather is applied per chunk of the
+        non-spatial dims (e.g. time); spatial chunks are merged first.
+
+        Parameters
+        ----------
+        obj : xr.DataArray or xr.Dataset
+            Data on the source grid with 'y' and 'x' dims.
+
+        Returns
+        -------
+        xr.DataArray or xr.Dataset
+            Data on the target grid.
+        """
+        if isinstance(obj, xr.Dataset):
+            spatial = [v for v in obj.data_vars if {"y", "x"} <= set(obj[v].dims)]
+            ds_out = xr.Dataset({v: self.apply(obj[v]) for v in spatial}, attrs=obj.attrs)
+            return ds_out
+
+        da = obj
+        if (da.sizes["y"], da.sizes["x"]) != self.source_shape:
+            raise ValueError(
+                f"DataArray grid {(da.sizes['y'], da.sizes['x'])} does not match "
+                f"the regridder source grid {self.source_shape}."
+            )
+        dtype = da.dtype if (self.index >= 0).all() else np.result_type(da.dtype, np.float32)
+        da_out = xr.apply_ufunc(
+            self._gather,
+            _single_spatial_chunk(da.drop_vars(["spatial_ref"], errors="ignore")),
+            input_core_dims=[["y", "x"]],
+            output_core_dims=[["y", "x"]],
+            exclude_dims={"y", "x"},
+            dask="parallelized",
+            output_dtypes=[dtype],
+            dask_gufunc_kwargs={"output_sizes": {"y": self.target_shape[0], "x": self.target_shape[1]}},
+            keep_attrs=True,
+        )
+        da_out = da_out.assign_coords(y=self.target_y, x=self.target_x)
+        da_out = da_out.transpose(*[d for d in da.dims])
+        if self.target_crs is not None:
+            da_out = da_out.rio.write_crs(self.target_crs)
+        return da_out
+
+
+def nearest_index(ds_source, ds_target) -> np.ndarray:
+    """
+    Flat index of the source pixel containing each target pixel centre.
+
+    Only grid metadata is used: target pixel centres are transformed to the
+    source CRS and located with the inverse of the source affine transform.
+
+    Parameters
+    ----------
+    ds_source : xr.Dataset or xr.DataArray
+        Source grid, with a rioxarray CRS.
+    ds_target : xr.Dataset or xr.DataArray
+        Target grid, with a rioxarray CRS.
+
+    Returns
+    -------
+    np.ndarray
+        int64 array of shape (ny_target * nx_target,), -1 where the target
+        pixel centre falls outside the source grid.
+    """
+    xx, yy = np.meshgrid(ds_target["x"].values, ds_target["y"].values)
+    xx, yy = xx.ravel(), yy.ravel()
+
+    source_crs = ds_source.rio.crs
+    target_crs = ds_target.rio.crs
+    if source_crs is not None and target_crs is not None and source_crs != target_crs:
+        from pyproj import Transformer
+
+        transformer = Transformer.from_crs(target_crs, source_crs, always_xy=True)
+        xx, yy = transformer.transform(xx, yy)
+
+    ny, nx = ds_source.sizes["y"], ds_source.sizes["x"]
+    cols, rows = ~ds_source.rio.transform() * (np.asarray(xx), np.asarray(yy))
+    finite = np.isfinite(cols) & np.isfinite(rows)
+    cols = np.floor(np.where(finite, cols, -1)).astype("int64")
+    rows = np.floor(np.where(finite, rows, -1)).astype("int64")
+
+    inside = (cols >= 0) & (cols < nx) & (rows >= 0) & (rows < ny)
+    return np.where(inside, rows * nx + cols, -1).astype("int64")
+
+
+AGGREGATIONS = ("mean", "sum")
+
+
+@dataclass
+class AggregationRegridder:
+    """
+    Conservative aggregation of a fine grid onto a coarser grid.
+
+    Every target pixel receives the area-weighted sum (or mean) of the source
+    pixels overlapping it, along with the fraction of its area covered by
+    valid source data, so that totals are conserved.
+
+    Three paths are used, from fastest to most general:
+
+    - 'block': same CRS, target pixels made of whole source pixels (integer
+      resolution ratio and aligned origins); reshape-based block reduction.
+    - 'separable': same CRS, arbitrary ratio; exact overlap weights, applied
+      as one sparse matrix product along y and one along x.
+    - 'sparse': different CRS; each source pixel is assigned to the target
+      pixel containing its centre (sparse weights).
+
+    Attributes
+    ----------
+    mode : str
+        'block', 'separable' or 'sparse'.
+    source_shape : tuple
+        (ny, nx) of the source grid.
+    target_y, target_x : np.ndarray
+        Coordinates of the target grid.
+    target_crs : str, optional
+        CRS of the target grid.
+    block : tuple, optional
+        (ky, kx, row_offset, col_offset) of the 'block' path, in source pixels.
+    weights_y, weights_x : scipy.sparse.csr_matrix, optional
+        Overlap weights (target, source) of the 'separable' path, as a fraction
+        of the source pixel.
+    weights : scipy.sparse.csr_matrix, optional
+        Weights (target pixels, source pixels) of the 'sparse' path.
+    target_area : np.ndarray or float
+        Area of the target pixels in source pixel units.
+    """
+    mode: str
+    source_shape: tuple
+    target_y: np.ndarray = field(repr=False)
+    target_x: np.ndarray = field(repr=False)
+    target_crs: Optional[str] = None
+    block: Optional[tuple] = None
+    weights_y: Optional[object] = field(default=None, repr=False)
+    weights_x: Optional[object] = field(default=None, repr=False)
+    weights: Optional[object] = field(default=None, repr=False)
+    target_area: object = field(default=1.0, repr=False)
+
+    @property
+    def target_shape(self) -> tuple:
+        return (self.target_y.size, self.target_x.size)
+
+    @classmethod
+    def from_grids(cls, ds_source, ds_target, cache_dir: str = None) -> "AggregationRegridder":
+        """
+        Build the aggregation weights between two grids from their metadata.
+
+        Parameters
+        ----------
+        ds_source : xr.Dataset or xr.DataArray
+            Dataset on the (fine) source grid, with a rioxarray CRS.
+        ds_target : xr.Dataset or xr.DataArray
+            Dataset on the (coarse) target grid.
+        cache_dir : str, optional
+            Directory where the weights of the 'sparse' path are cached.
+
+        Returns
+        -------
+        AggregationRegridder
+        """
+        source_crs, target_crs = ds_source.rio.crs, ds_target.rio.crs
+        source_shape = (ds_source.sizes["y"], ds_source.sizes["x"])
+        target_y = np.asarray(ds_target["y"].values)
+        target_x = np.asarray(ds_target["x"].values)
+        common = dict(source_shape=source_shape, target_y=target_y, target_x=target_x,
+                      target_crs=str(target_crs) if target_crs else None)
+        ts, tt = ds_source.rio.transform(), ds_target.rio.transform()
+
+        if source_crs is None or target_crs is None or source_crs == target_crs:
+            block = _block_factors(ts, tt)
+            if block is not None:
+                return cls("block", block=block, target_area=float(block[0] * block[1]), **common)
+
+            edges_sy = ts.f + ts.e * np.arange(source_shape[0] + 1)
+            edges_sx = ts.c + ts.a * np.arange(source_shape[1] + 1)
+            edges_ty = tt.f + tt.e * np.arange(target_y.size + 1)
+            edges_tx = tt.c + tt.a * np.arange(target_x.size + 1)
+            target_area = abs(tt.e / ts.e) * abs(tt.a / ts.a)
+            return cls("separable",
+                       weights_y=_overlap_weights(edges_sy, edges_ty),
+                       weights_x=_overlap_weights(edges_sx, edges_tx),
+                       target_area=target_area, **common)
+
+        from scipy import sparse
+
+        path = None
+        index = None
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            key = f"{grid_signature(ds_source)}_{grid_signature(ds_target)}_aggregate"
+            path = os.path.join(cache_dir, f"{key}.npz")
+            if os.path.exists(path):
+                with np.load(path) as cached:
+                    index = cached["index"]
+        if index is None:
+            # target pixel containing each source pixel centre
+            index = nearest_index(ds_target, ds_source)
+            if path is not None:
+                tmp_path = path + ".tmp.npz"
+                np.savez(tmp_path, index=index)
+                os.replace(tmp_path, path)
+
+        inside = np.flatnonzero(index >= 0)
+        n_target = target_y.size * target_x.size
+        weights = sparse.csr_matrix(
+            (np.ones(inside.size), (index[inside], inside)),
+            shape=(n_target, source_shape[0] * source_shape[1]),
+        )
+        target_area = np.asarray(weights.sum(axis=1)).ravel().reshape(target_y.size, target_x.size)
+        return cls("sparse", weights=weights, target_area=target_area, **common)
+
+    def _reduce(self, values: np.ndarray):
+        """Return (sum, valid area) of `values` (..., ny, nx) on the target grid."""
+        values = values.astype(np.result_type(values.dtype, np.float32), copy=False)
+        lead = values.shape[:-2]
+        ny_t, nx_t = self.target_shape
+
+        if self.mode == "block":
+            ky, kx, row0, col0 = self.block
+            ny, nx = self.source_shape
+            rows = (max(-row0, 0), max(row0 + ny_t * ky - ny, 0))
+            cols = (max(-col0, 0), max(col0 + nx_t * kx - nx, 0))
+            if any(rows + cols):
+                values = np.pad(values, [(0, 0)] * len(lead) + [rows, cols], constant_values=np.nan)
+            r, c = row0 + rows[0], col0 + cols[0]
+            values = values[..., r:r + ny_t * ky, c:c + nx_t * kx]
+            values = values.reshape(*lead, ny_t, ky, nx_t, kx)
+            valid = np.isfinite(values)
+            total = np.where(valid, values, 0).sum(axis=(-3, -1))
+            area = valid.sum(axis=(-3, -1)).astype(total.dtype)
+            return total, area
+
+        valid = np.isfinite(values)
+        filled = np.where(valid, values, 0)
+        stacked = np.stack([filled, valid.astype(filled.dtype)])
+        if self.mode == "separable":
+            out = self._apply_separable(stacked)
+        else:
+            flat = stacked.reshape(-1, self.source_shape[0] * self.source_shape[1])
+            out = np.asarray((self.weights @ flat.T).T).reshape(*stacked.shape[:-2], ny_t, nx_t)
+        return out[0].astype(filled.dtype), out[1].astype(filled.dtype)
+
+    def _apply_separable(self, values: np.ndarray) -> np.ndarray:
+        lead = values.shape[:-2]
+        ny, nx = self.source_shape
+        ny_t, nx_t = self.target_shape
+        flat = values.reshape(-1, nx)
+        # along x: (L * ny, nx) -> (L * ny, nx_t)
+        out = np.asarray(self.weights_x @ flat.T).T.reshape(-1, ny, nx_t)
+        # along y: (ny, L * nx_t) -> (ny_t, L * nx_t)
+        out = out.transpose(1, 0, 2).reshape(ny, -1)
+        out = np.asarray(self.weights_y @ out).reshape(ny_t, -1, nx_t).transpose(1, 0, 2)
+        return out.reshape(*lead, ny_t, nx_t)
+
+    def _aggregate(self, values: np.ndarray, how: str):
+        total, area = self._reduce(values)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = total / area if how == "mean" else total
+        result = np.where(area > 0, result, np.nan)
+        fraction = area / self.target_area
+        return result, fraction.astype(result.dtype)
+
+    def apply(self, obj, how: str = "mean"):
+        """
+        Aggregate a DataArray or every spatial variable of a Dataset.
+
+        Parameters
+        ----------
+        obj : xr.DataArray or xr.Dataset
+            Data on the source grid with 'y' and 'x' dims. Dask-backed inputs
+            stay lazy and are processed per chunk of the non-spatial dims;
+            spatial chunks are merged first.
+        how : str, optional
+            'mean' (area-weighted mean of the valid source pixels) or 'sum'
+            (area-weighted sum, which conserves totals). Default is 'mean'.
+
+        Returns
+        -------
+        tuple or xr.Dataset
+            For a DataArray, the aggregated DataArray and the fraction of each
+            target pixel covered by valid source data. For a Dataset, a Dataset
+            with '<var>' and '<var>_valid_fraction'.
+        """
+        if how not in AGGREGATIONS:
+            raise ValueError(f"how must be one of {AGGREGATIONS}.")
+
+        if isinstance(obj, xr.Dataset):
+            ds_out = xr.Dataset(attrs=obj.attrs)
+            for v in obj.data_vars:
+                if {"y", "x"} <= set(obj[v].dims):
+                    ds_out[v], ds_out[f"{v}_valid_fraction"] = self.apply(obj[v], how=how)
+            return ds_out
+
+        da = obj
+        if (da.sizes["y"], da.sizes["x"]) != self.source_shape:
+            raise ValueError(
+                f"DataArray grid {(da.sizes['y'], da.sizes['x'])} does not match "
+                f"the regridder source grid {self.source_shape}."
+            )
+        dtype = np.result_type(da.dtype, np.float32)
+        outputs = xr.apply_ufunc(
+            self._aggregate,
+            _single_spatial_chunk(da.drop_vars(["spatial_ref"], errors="ignore")),
+            kwargs={"how": how},
+            input_core_dims=[["y", "x"]],
+            output_core_dims=[["y", "x"], ["y", "x"]],
+            exclude_dims={"y", "x"},
+            dask="parallelized",
+            output_dtypes=[dtype, dtype],
+            dask_gufunc_kwargs={"output_sizes": {"y": self.target_shape[0], "x": self.target_shape[1]}},
+            keep_attrs=True,
+        )
+        results = []
+        for da_out in outputs:
+            da_out = da_out.assign_coords(y=self.target_y, x=self.target_x)
+            da_out = da_out.transpose(*[d for d in da.dims])
+            if self.target_crs is not None:
+                da_out = da_out.rio.write_crs(self.target_crs)
+            results.append(da_out)
+        results[1].attrs = {"long_name": "valid fraction"}
+        return tuple(results)
+
+
+def _single_spatial_chunk(da: xr.DataArray) -> xr.DataArray:
+    # y/x are core dims of the regridding ufuncs, which need them in one chunk
+    if da.chunks is not None and (len(da.chunksizes["y"]) > 1 or len(da.chunksizes["x"]) > 1):
+        return da.chunk({"y": -1, "x": -1})
+    return da
+
+
+def _block_factors(ts, tt, tol: float = 1e-6):
+    """
+    (ky, kx, row_offset, col_offset) if the target pixels are made of whole
+    source pixels, else None.
+    """
+    if ts.b != 0 or ts.d != 0 or tt.b != 0 or tt.d != 0:
+        return None
+    if np.sign(ts.a) != np.sign(tt.a) or np.sign(ts.e) != np.sign(tt.e):
+        return None
+    factors = []
+    for ratio in (tt.e / ts.e, tt.a / ts.a, (tt.f - ts.f) / ts.e, (tt.c - ts.c) / ts.a):
+        if abs(ratio - round(ratio)) > tol:
+            return None
+        factors.append(int(round(ratio)))
+    if factors[0] < 1 or factors[1] < 1:
+        return None
+    return tuple(factors)
+
+
+def _overlap_weights(edges_source: np.ndarray, edges_target: np.ndarray):
+    """
+    Sparse (n_target, n_source) matrix of the fraction of each source cell
+    lying within each target cell, along one axis.
+    """
+    from scipy import sparse
+
+    lo_s = np.minimum(edges_source[:-1], edges_source[1:])
+    hi_s = np.maximum(edges_source[:-1], edges_source[1:])
+    lo_t = np.minimum(edges_target[:-1], edges_target[1:])
+    hi_t = np.maximum(edges_target[:-1], edges_target[1:])
+
+    order = np.argsort(lo_s)
+    lo_sorted, hi_sorted = lo_s[order], hi_s[order]
+    first = np.searchsorted(hi_sorted, lo_t, side="right")
+    last = np.searchsorted(lo_sorted, hi_t, side="left")
+    counts = np.maximum(last - first, 0)
+
+    rows = np.repeat(np.arange(lo_t.size), counts)
+    starts = np.repeat(first, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cols = order[starts + offsets]
+
+    overlap = np.minimum(hi_t[rows], hi_s[cols]) - np.maximum(lo_t[rows], lo_s[cols])
+    fraction = np.clip(overlap, 0, None) / (hi_s[cols] - lo_s[cols])
+    keep = fraction > 0
+    return sparse.csr_matrix((fraction[keep], (rows[keep], cols[keep])),
+                             shape=(lo_t.size, lo_s.size))
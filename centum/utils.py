@@ -1,8 +1,10 @@
 '''
 Utilities for analyzing evapotranspiration (ET) data using xarray.
 '''
+import hashlib
+
+import numpy as np
 import xarray as xr
-from rasterio.enums import Resampling  # Import Resampling enum
 
 def get_CLC_code_def():
     
@@ -57,10 +59,52 @@ def get_CLC_code_def():
 
 
 
+def grid_signature(ds):
+    """
+    Short hash identifying the spatial grid of a dataset.
+
+    Parameters:
+    - ds: xarray.Dataset or DataArray with 'y' and 'x' coordinates
+
+    Returns:
+    - str: hash of the y/x coordinates and the CRS
+    """
+    h = hashlib.sha1()
+    for dim in ("y", "x"):
+        h.update(np.ascontiguousarray(ds[dim].values, dtype="float64").tobytes())
+    try:
+        crs = ds.rio.crs
+    except Exception:
+        crs = None
+    h.update(str(crs).encode())
+    return h.hexdigest()[:16]
+
+
+def same_grid(ds1, ds2):
+    """
+    Check whether two datasets share the same spatial grid (y/x coordinates and CRS).
+    """
+    if ds1.sizes["y"] != ds2.sizes["y"] or ds1.sizes["x"] != ds2.sizes["x"]:
+        return False
+    if str(ds1.rio.crs) != str(ds2.rio.crs):
+        return False
+    return bool(np.allclose(ds1["y"].values, ds2["y"].values)
+                and np.allclose(ds1["x"].values, ds2["x"].values))
+
+
+_RESOLUTION_CACHE = {}
+
+
 def get_resolution(ds, crs=None):
     """
     Calculate the spatial resolution of a rioxarray-enabled dataset.
 
+    Only the grid metadata is used: when `crs` differs from the dataset CRS,
+    the resolution rioxarray would give to the reprojected grid is derived
+    from the transform and a few control points along the grid edges
+    (rasterio.warp.calculate_default_transform), without reprojecting the
+    data. Results are cached per grid signature and CRS.
+
     Parameters:
     - ds: xarray.Dataset or DataArray with spatial coordinates
     - crs: optional string or CRS object, e.g. 'EPSG:32630' or None
@@ -76,88 +120,87 @@ def get_resolution(ds, crs=None):
             raise ValueError("Dataset has no CRS and no 'crs' argument was provided.")
         # Assign the CRS without reprojecting
         ds = ds.rio.write_crs(crs, inplace=False)
-    else:
-        # If CRS exists and crs argument is provided, reproject if different
-        if crs is not None:
-            if str(ds.rio.crs) != str(crs):
-                ds = ds.rio.reproject(crs)
 
-    # Now get resolution
-    resolution = ds.rio.resolution()  # returns (xres, yres)
-    return resolution
+    if crs is None or str(ds.rio.crs) == str(crs):
+        return ds.rio.resolution()  # returns (xres, yres)
 
+    key = (grid_signature(ds), str(crs))
+    if key not in _RESOLUTION_CACHE:
+        from rasterio.warp import calculate_default_transform
 
-def remap_to_coarser(ds_fine, ds_coarse):
+        transform, _, _ = calculate_default_transform(
+            ds.rio.crs, crs, ds.rio.width, ds.rio.height, *ds.rio.bounds()
+        )
+        _RESOLUTION_CACHE[key] = (transform.a, transform.e)
+    return _RESOLUTION_CACHE[key]
+
+
+def remap_to_coarser(ds_fine, ds_coarse, regridder=None, cache_dir=None, method='nearest'):
     """
-    Remap the fine dataset to the grid of the coarse dataset using rioxarray.
+    Remap the fine dataset to the grid of the coarse dataset.
+
+    With method='nearest', the source -> target pixel mapping is computed once
+    from the grid metadata (see centum.regrid.Regridder) and applied to every
+    variable and time step as a single gather. NaNs are carried along by the
+    gather, so the remapped variables are masked wherever the nearest fine
+    pixel is invalid.
+
+    With method='mean' or 'sum', every coarse pixel aggregates all the fine
+    pixels overlapping it (see centum.regrid.AggregationRegridder): a block
+    reduction when the grids are aligned with integer ratios, sparse
+    conservative weights otherwise. 'sum' conserves totals (e.g. volumes),
+    and a '<var>_valid_fraction' variable gives the fraction of each coarse
+    pixel covered by valid fine data.
 
     Parameters:
     - ds_fine: xarray Dataset with finer resolution
     - ds_coarse: xarray Dataset with coarser resolution
-    - variable: variable name to remap
+    - regridder: optional regridder built with Regridder.from_grids(ds_fine, ds_coarse)
+      (or AggregationRegridder.from_grids for 'mean'/'sum'), reused across calls
+      (e.g. for ETa, ETp, rain and CLC layers sharing the same grid)
+    - cache_dir: optional directory caching the mapping between the two grids
+    - method: 'nearest' (default), 'mean' or 'sum'
 
     Returns:
-    - xarray Dataset: Coarse dataset with remapped variable from the fine dataset
+    - xarray Dataset: Coarse dataset with remapped variables named '<var>_remapped'
     """
-    # Reproject the fine dataset to match the coarse dataset
-    # ds_fine_remapped = ds_fine.rio.reproject_match(ds_coarse, 
-    #                                                 resampling=Resampling.nearest
-    #                                                 )
+    from centum.regrid import AggregationRegridder, Regridder
 
-    ds_remapped = xr.Dataset()
-    
-    for var in ds_fine.data_vars:
-        # Step 1: Create a boolean valid-data mask
-        valid_mask = ~ds_fine[var].isnull()
-    
-        # Step 2: Convert to float32 for reprojection (True → 1.0, False → NaN)
-        valid_mask_float = valid_mask.astype("float32")
-    
-        # Step 3: Reproject the float mask to the coarse grid
-        valid_mask_remapped_float = valid_mask_float.rio.reproject_match(
-            ds_coarse, resampling=Resampling.nearest
-        )
-    
-        # Step 4: Convert back to boolean mask
-        valid_mask_remapped = valid_mask_remapped_float == 1.0
-    
-        # Step 5: Fill NaNs in the original fine variable
-        ds_filled = ds_fine[var].fillna(0)
-    
-        # Step 6: Reproject the filled variable
-        ds_var_remapped = ds_filled.rio.reproject_match(
-            ds_coarse, resampling=Resampling.nearest
-        )
-    
-        # Step 7: Mask out originally invalid areas
-        ds_remapped[f'{var}_remapped'] = ds_var_remapped.where(valid_mask_remapped)
+    if method == 'nearest':
+        if regridder is None:
+            regridder = Regridder.from_grids(ds_fine, ds_coarse, cache_dir=cache_dir)
+        ds_remapped = regridder.apply(ds_fine)
+        return ds_remapped.rename({var: f'{var}_remapped' for var in ds_remapped.data_vars})
 
-    return ds_remapped
+    if regridder is None:
+        regridder = AggregationRegridder.from_grids(ds_fine, ds_coarse, cache_dir=cache_dir)
+    ds_remapped = regridder.apply(ds_fine, how=method)
+    return ds_remapped.rename({var: f'{var}_remapped' for var in ds_fine.data_vars
+                               if var in ds_remapped.data_vars})
 
-def match_resolution(ds1, ds2):
+def match_resolution(ds1, ds2, method='nearest'):
     """
     Check which dataset has the finest resolution and remap the finest to the coarser one.
 
     Parameters:
     - ds1: First xarray Dataset
     - ds2: Second xarray Dataset
-    - variable: variable name to remap
+    - method: 'nearest' (default), 'mean' or 'sum', see remap_to_coarser
 
     Returns:
     - xarray Dataset: Dataset with the coarser resolution, including the remapped variable
     """
-    # Calculate resolutions
+    # Calculate resolutions, both in the CRS of Dataset 1 (metadata only)
     res1 = get_resolution(ds1)
-    res2 = get_resolution(ds2)
+    res2 = get_resolution(ds2, crs=ds1.rio.crs)
 
     print(f"Resolution of Dataset 1: {res1}")
     print(f"Resolution of Dataset 2: {res2}")
 
-    # Determine which dataset is finer
-    if res1[0] < res2[0] and res1[1] < res2[1]:
+    # Determine which dataset is finer (y resolutions are negative for north-up grids)
+    if abs(res1[0]) < abs(res2[0]) and abs(res1[1]) < abs(res2[1]):
         print("Dataset 1 has finer resolution. Remapping to Dataset 2 grid.")
-        return remap_to_coarser(ds1, ds2)
+        return remap_to_coarser(ds1, ds2, method=method)
     else:
         print("Dataset 2 has finer resolution. Remapping to Dataset 1 grid.")
-        return remap_to_coarser(ds2, ds1)
-    
+        return remap_to_coarser(ds2, ds1, method=method)
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Zonal statistics of raster cubes over irrigation districts, parcels or land-cover classes.
+"""
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+import xarray as xr
+
+
+@dataclass
+class ZoneCoverage:
+    """
+    Sparse fractional coverage of raster pixels by zones.
+
+    Entry (p, z) of `matrix` is the fraction of pixel p (flat index in (y, x)
+    order) covered by zone z, so that zonal sums are one sparse
+    matrix-vector product per time step.
+
+    Attributes
+    ----------
+    matrix : scipy.sparse.csr_matrix
+        Coverage fractions, shape (ny * nx, n_zones).
+    zones : np.ndarray
+        Zone identifiers, one per matrix column.
+    y, x : np.ndarray
+        Coordinates of the raster grid.
+    crs : str, optional
+        CRS of the raster grid.
+    """
+    matrix: object = field(repr=False)
+    zones: np.ndarray
+    y: np.ndarray = field(repr=False)
+    x: np.ndarray = field(repr=False)
+    crs: Optional[str] = None
+
+    @property
+    def shape(self) -> tuple:
+        return (self.y.size, self.x.size)
+
+    def to_xarray(self) -> xr.DataArray:
+        """
+        Coverage as a COO-style DataArray of (pixel, zone, fraction) triplets.
+        """
+        coo = self.matrix.tocoo()
+        rows, cols = np.divmod(coo.row, self.x.size)
+        return xr.DataArray(
+            coo.data,
+            dims="entry",
+            coords={
+                "y": ("entry", self.y[rows]),
+                "x": ("entry", self.x[cols]),
+                "zone": ("entry", self.zones[coo.col]),
+            },
+            name="fraction",
+        )
+
+    def _flatten(self, da: xr.DataArray) -> tuple:
+        if (da.sizes["y"], da.sizes["x"]) != self.shape:
+            raise ValueError(f"DataArray grid {(da.sizes['y'], da.sizes['x'])} does not match "
+                             f"the coverage grid {self.shape}.")
+        lead_dims = [d for d in da.dims if d not in ("y", "x")]
+        values = np.asarray(da.transpose(*lead_dims, "y", "x").values, dtype="float64")
+        return lead_dims, values.reshape(-1, self.shape[0] * self.shape[1])
+
+    def _wrap(self, da: xr.DataArray, lead_dims: list, result: np.ndarray) -> xr.DataArray:
+        lead_shape = [da.sizes[d] for d in lead_dims]
+        coords = {d: da[d].values for d in lead_dims if d in da.coords}
+        coords["zone"] = self.zones
+        return xr.DataArray(result.reshape(*lead_shape, self.zones.size),
+                            dims=(*lead_dims, "zone"), coords=coords,
+                            name=da.name, attrs=da.attrs)
+
+    def zonal_sum(self, da: xr.DataArray) -> xr.DataArray:
+        """
+        Coverage-weighted sum over the pixels of each zone (NaN counts as 0).
+
+        Parameters
+        ----------
+        da : xr.DataArray
+            DataArray with 'y' and 'x' dims on the coverage grid, e.g. (time, y, x).
+
+        Returns
+        -------
+        xr.DataArray
+            Sums with the non-spatial dims of `da` and a 'zone' dim.
+        """
+        if isinstance(da, xr.Dataset):
+            return xr.Dataset({v: self.zonal_sum(da[v]) for v in da.data_vars
+                               if {"y", "x"} <= set(da[v].dims)})
+        lead_dims, values = self._flatten(da)
+        result = np.asarray(self.matrix.T @ np.nan_to_num(values).T).T
+        return self._wrap(da, lead_dims, result)
+
+    def zonal_mean(self, da: xr.DataArray) -> xr.DataArray:
+        """
+        Coverage-weighted mean over the valid pixels of each zone.
+
+        Parameters
+        ----------
+        da : xr.DataArray
+            DataArray with 'y' and 'x' dims on the coverage grid.
+
+        Returns
+        -------
+        xr.DataArray
+            Means with the non-spatial dims of `da` and a 'zone' dim.
+        """
+        if isinstance(da, xr.Dataset):
+            return xr.Dataset({v: self.zonal_mean(da[v]) for v in da.data_vars
+                               if {"y", "x"} <= set(da[v].dims)})
+        lead_dims, values = self._flatten(da)
+        valid = np.isfinite(values)
+        total = np.asarray(self.matrix.T @ np.where(valid, values, 0.0).T).T
+        weight = np.asarray(self.matrix.T @ valid.T.astype("float64")).T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = total / weight
+        return self._wrap(da, lead_dims, result)
+
+
+@dataclass
+class ZoneIndex:
+    """
+    Pixel lists of every zone of a zone raster, stored CSR-style.
+
+    The pixels of zone `zones[k]` are `pixels[offsets[k]:offsets[k + 1]]`
+    (flat indices in (y, x) order). Built once from a zone raster, it gives
+    the statistics of all zones in a single pass over a (time, y, x) cube,
+    instead of one boolean mask and one pass per zone.
+
+    Attributes
+    ----------
+    zones : np.ndarray
+        Zone labels (raster values), sorted.
+    offsets : np.ndarray
+        Start of each zone in `pixels`, length n_zones + 1.
+    pixels : np.ndarray
+        Flat pixel indices grouped by zone.
+    shape : tuple
+        (ny, nx) of the zone raster.
+    """
+    zones: np.ndarray
+    offsets: np.ndarray = field(repr=False)
+    pixels: np.ndarray = field(repr=False)
+    shape: tuple
+
+    @classmethod
+    def from_raster(cls, zone_raster, nodata=None) -> "ZoneIndex":
+        """
+        Build the index from a zone raster.
+
+        Parameters
+        ----------
+        zone_raster : xr.DataArray or np.ndarray
+            Zone labels with dims (y, x), e.g. a land-cover or district raster.
+        nodata : scalar, optional
+            Label to ignore in addition to NaN (e.g. the 'nodata' category of geocube).
+
+        Returns
+        -------
+        ZoneIndex
+        """
+        if isinstance(zone_raster, xr.DataArray):
+            zone_raster = zone_raster.transpose("y", "x").values
+        values = np.asarray(zone_raster).ravel()
+        valid = ~np.isnan(values) if np.issubdtype(values.dtype, np.floating) else np.ones(values.size, bool)
+        if nodata is not None:
+            valid &= values != nodata
+
+        pixels = np.flatnonzero(valid)
+        order = np.argsort(values[pixels], kind="stable")
+        pixels = pixels[order]
+        zones, counts = np.unique(values[pixels], return_counts=True)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return cls(zones, offsets, pixels, tuple(np.shape(zone_raster)))
+
+    @property
+    def counts(self) -> np.ndarray:
+        """Number of pixels of each zone."""
+        return np.diff(self.offsets)
+
+    def mask(self, zone) -> np.ndarray:
+        """Boolean (y, x) mask of one zone, as returned by `get_mask_IN_patch_i`."""
+        k = np.searchsorted(self.zones, zone)
+        out = np.zeros(self.shape[0] * self.shape[1], dtype=bool)
+        if k < self.zones.size and self.zones[k] == zone:
+            out[self.pixels[self.offsets[k]:self.offsets[k + 1]]] = True
+        return out.reshape(self.shape)
+
+    def stats(self, da: xr.DataArray, stats: tuple = ("mean", "sum", "count"),
+              quantiles: tuple = None, block_size: int = 64) -> xr.Dataset:
+        """
+        Zonal statistics of all zones in one pass over the cube.
+
+        The cube is read in blocks of `block_size` steps of its leading
+        dimension; for each block, the pixels of all zones are gathered once
+        and reduced per zone segment.
+
+        Parameters
+        ----------
+        da : xr.DataArray
+            DataArray with dims (..., y, x), e.g. (time, y, x), on the zone raster grid.
+        stats : tuple, optional
+            Any of 'mean', 'sum', 'count'. NaN pixels are ignored.
+        quantiles : tuple, optional
+            Quantiles to compute per zone, e.g. (0.1, 0.5, 0.9).
+        block_size : int, optional
+            Number of leading steps (e.g. time steps) loaded at once.
+
+        Returns
+        -------
+        xr.Dataset
+            One variable per statistic with the non-spatial dims of `da` and a
+            'zone' dim; 'quantiles' has an extra 'quantile' dim.
+        """
+        if (da.sizes["y"], da.sizes["x"]) != self.shape:
+            raise ValueError(f"DataArray grid {(da.sizes['y'], da.sizes['x'])} does not match "
+                             f"the zone raster grid {self.shape}.")
+        lead_dims = [d for d in da.dims if d not in ("y", "x")]
+        da = da.transpose(*lead_dims, "y", "x")
+        lead_shape = [da.sizes[d] for d in lead_dims]
+        n_lead = int(np.prod(lead_shape)) if lead_shape else 1
+        n_zones = self.zones.size
+        starts = self.offsets[:-1]
+
+        out = {name: np.empty((n_lead, n_zones)) for name in stats}
+        if quantiles is not None:
+            out["quantiles"] = np.empty((len(quantiles), n_lead, n_zones))
+
+        flat = da.data.reshape(n_lead, -1)
+        for i0 in range(0, n_lead, block_size):
+            block = np.asarray(flat[i0:i0 + block_size], dtype="float64")[:, self.pixels]
+            valid = np.isfinite(block)
+            total = np.add.reduceat(np.where(valid, block, 0.0), starts, axis=1)
+            count = np.add.reduceat(valid, starts, axis=1)
+            sl = slice(i0, i0 + block.shape[0])
+            if "sum" in out:
+                out["sum"][sl] = total
+            if "count" in out:
+                out["count"][sl] = count
+            if "mean" in out:
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    out["mean"][sl] = total / count
+            if quantiles is not None:
+                out["quantiles"][:, sl] = self._segment_quantiles(block, valid, count, quantiles)
+
+        coords = {d: da[d].values for d in lead_dims if d in da.coords}
+        coords["zone"] = self.zones
+        ds_out = xr.Dataset(coords=coords)
+        for name, values in out.items():
+            if name == "quantiles":
+                ds_out[name] = (("quantile", *lead_dims, "zone"),
+                                values.reshape(len(quantiles), *lead_shape, n_zones))
+                ds_out = ds_out.assign_coords(quantile=list(quantiles))
+            else:
+                ds_out[name] = ((*lead_dims, "zone"), values.reshape(*lead_shape, n_zones))
+        return ds_out
+
+    def _segment_quantiles(self, block: np.ndarray, valid: np.ndarray, count: np.ndarray,
+                           quantiles: tuple) -> np.ndarray:
+        """
+        Quantiles (linear interpolation, as `np.nanquantile`) of every zone
+        segment of a (steps, pixels) block, without a loop over zones.
+
+        The values of each step are sorted within their zone segment (invalid
+        pixels last), and every quantile is interpolated between the two
+        sorted values around its rank in the segment.
+        """
+        segment_id = np.repeat(np.arange(self.zones.size), self.counts)
+        ordered = np.where(valid, block, np.inf)
+        for i in range(ordered.shape[0]):
+            ordered[i] = ordered[i, np.lexsort((ordered[i], segment_id))]
+
+        q = np.asarray(quantiles, dtype="float64")[:, None, None]
+        rank = (count[None] - 1) * q                          # (quantile, step, zone)
+        low = np.floor(rank).astype("int64")
+        high = np.minimum(low + 1, count[None] - 1)
+        empty = count[None] == 0
+        starts = self.offsets[:-1][None, None, :]
+        rows = np.arange(ordered.shape[0])[None, :, None]
+        v_low = ordered[rows, starts + np.where(empty, 0, low)]
+        v_high = ordered[rows, starts + np.where(empty, 0, high)]
+        with np.errstate(invalid="ignore"):
+            values = v_low + (rank - low) * (v_high - v_low)
+        return np.where(empty, np.nan, values)
+
+    def mean(self, da: xr.DataArray) -> xr.DataArray:
+        return self.stats(da, stats=("mean",))["mean"]
+
+    def sum(self, da: xr.DataArray) -> xr.DataArray:
+        return self.stats(da, stats=("sum",))["sum"]
+
+    def count(self, da: xr.DataArray) -> xr.DataArray:
+        return self.stats(da, stats=("count",))["count"]
+
+    def quantile(self, da: xr.DataArray, q) -> xr.DataArray:
+        return self.stats(da, stats=(), quantiles=tuple(np.atleast_1d(q)))["quantiles"]
+
+
+def zonal_sum(da: xr.DataArray, zones: xr.DataArray) -> xr.DataArray:
+    """
+    Sum a (time, y, x) DataArray over the pixels of each zone.
+
+    Parameters
+    ----------
+    da : xr.DataArray
+        DataArray to aggregate.
+    zones : xr.DataArray or ZoneCoverage
+        Zone raster (y, x) on the same grid as `da` (NaN or negative values
+        are ignored), or a fractional coverage of the grid by the zones.
+
+    Returns
+    -------
+    xr.DataArray
+        Totals with dims (time, zone).
+    """
+    if isinstance(zones, ZoneCoverage):
+        return zones.zonal_sum(da)
+
+    zone_values = np.asarray(zones.values, dtype="float64").ravel()
+    valid = np.isfinite(zone_values) & (zone_values >= 0)
+    zone_ids, inverse = np.unique(zone_values[valid], return_inverse=True)
+
+    data = np.asarray(da.transpose("time", *zones.dims).values).reshape(da.sizes["time"], -1)[:, valid]
+    totals = np.zeros((data.shape[0], zone_ids.size))
+    for t in range(data.shape[0]):
+        totals[t] = np.bincount(inverse, weights=np.nan_to_num(data[t]), minlength=zone_ids.size)
+
+    return xr.DataArray(
+        totals,
+        dims=("time", "zone"),
+        coords={"time": da["time"].values, "zone": zone_ids.astype("int64")},
+        attrs=da.attrs,
+    )
+
+
+def compute_coverage(gdf, transform, shape: tuple, zone_column: str = None, crs=None) -> ZoneCoverage:
+    """
+    Compute the fraction of each pixel covered by each zone polygon.
+
+    For every polygon, only the pixels of its bounding window are tested:
+    pixels fully inside get a fraction of 1 without any geometric
+    intersection, and exact intersection areas are computed for the boundary
+    pixels only.
+
+    Parameters
+    ----------
+    gdf : gpd.GeoDataFrame
+        Polygons, in the CRS of the raster grid.
+    transform : affine.Affine
+        Affine transform of the raster grid.
+    shape : tuple
+        (ny, nx) of the raster grid.
+    zone_column : str, optional
+        Column holding the zone identifiers. Polygons sharing an identifier
+        form one zone. Default is the row position in `gdf`.
+    crs : optional
+        CRS of the raster grid, stored with the coverage.
+
+    Returns
+    -------
+    ZoneCoverage
+    """
+    import shapely
+    from scipy import sparse
+
+    ny, nx = shape
+    if zone_column is not None:
+        zones, zone_of_geom = np.unique(np.asarray(gdf[zone_column].values), return_inverse=True)
+    else:
+        zones = np.arange(len(gdf))
+        zone_of_geom = zones
+
+    pixel_area = abs(transform.a * transform.e - transform.b * transform.d)
+    inverse = ~transform
+
+    rows_all, cols_all, data_all = [], [], []
+    for i, geom in enumerate(gdf.geometry.values):
+        if geom is None or geom.is_empty:
+            continue
+        minx, miny, maxx, maxy = geom.bounds
+        corner_cols, corner_rows = inverse * (np.array([minx, maxx, minx, maxx]),
+                                              np.array([miny, miny, maxy, maxy]))
+        c0 = max(int(np.floor(corner_cols.min())), 0)
+        c1 = min(int(np.ceil(corner_cols.max())), nx)
+        r0 = max(int(np.floor(corner_rows.min())), 0)
+        r1 = min(int(np.ceil(corner_rows.max())), ny)
+        if c0 >= c1 or r0 >= r1:
+            continue
+
+        rr, cc = np.meshgrid(np.arange(r0, r1), np.arange(c0, c1), indexing="ij")
+        rr, cc = rr.ravel(), cc.ravel()
+        x0, y0 = transform * (cc, rr)
+        x1, y1 = transform * (cc + 1, rr + 1)
+        boxes = shapely.box(np.minimum(x0, x1), np.minimum(y0, y1),
+                            np.maximum(x0, x1), np.maximum(y0, y1))
+
+        shapely.prepare(geom)
+        fraction = np.zeros(boxes.size)
+        inside = shapely.contains(geom, boxes)
+        fraction[inside] = 1.0
+        boundary = ~inside & shapely.intersects(geom, boxes)
+        if boundary.any():
+            fraction[boundary] = shapely.area(shapely.intersection(boxes[boundary], geom)) / pixel_area
+
+        keep = fraction > 0
+        rows_all.append(rr[keep] * nx + cc[keep])
+        cols_all.append(np.full(keep.sum(), zone_of_geom[i]))
+        data_all.append(fraction[keep])
+
+    if rows_all:
+        rows, cols, data = (np.concatenate(a) for a in (rows_all, cols_all, data_all))
+    else:
+        rows = cols = np.array([], dtype="int64")
+        data = np.array([], dtype="float64")
+
+    matrix = sparse.csr_matrix((data, (rows, cols)), shape=(ny * nx, zones.size))
+    matrix.sum_duplicates()
+    # overlapping polygons of the same zone cannot cover more than the pixel
+    np.minimum(matrix.data, 1.0, out=matrix.data)
+
+    y = (transform * (np.zeros(ny), np.arange(ny) + 0.5))[1]
+    x = (transform * (np.arange(nx) + 0.5, np.zeros(nx)))[0]
+    return ZoneCoverage(matrix, zones, np.asarray(y), np.asarray(x),
+                        str(crs) if crs is not None else None)